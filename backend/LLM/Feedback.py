@@ -1,32 +1,10 @@
-from groq import Groq
+from groq import Groq, APITimeoutError
 from typing import Dict, Any
 import json
-import numpy as np
+import time
+from admission import DeadlineExceeded, client_options
 
-def convert_numpy_types(obj):
-    """Recursively convert numpy types to native Python types for JSON serialization"""
-    try:
-        import numpy as np
-        
-        if isinstance(obj, dict):
-            return {key: convert_numpy_types(value) for key, value in obj.items()}
-        elif isinstance(obj, (list, tuple)):
-            return [convert_numpy_types(item) for item in obj]
-        elif isinstance(obj, np.floating):  # Catches all numpy float types
-            return float(obj)
-        elif isinstance(obj, np.integer):   # Catches all numpy int types
-            return int(obj)
-        elif isinstance(obj, np.ndarray):   # Handle numpy arrays
-            return obj.tolist()
-        elif hasattr(obj, 'item'):          # For numpy scalars
-            return obj.item()
-        else:
-            return obj
-    except ImportError:
-        # If numpy is not available, return as-is
-        return obj
-
-def generate_resume_feedback_with_groq(eligibility_result: Dict[str, Any], resume_text: str, target_category: str) -> Dict[str, Any]:
+def generate_resume_feedback_with_groq(eligibility_result: Dict[str, Any], resume_text: str, target_category: str, deadline: float = None) -> Dict[str, Any]:
     """
     Generate personalized resume feedback based on eligibility check results using Groq API
     
@@ -34,11 +12,12 @@ def generate_resume_feedback_with_groq(eligibility_result: Dict[str, Any], resum
         eligibility_result (Dict): Result from check_eligibility function
         resume_text (str): Original resume text extracted from image
         target_category (str): Target job category applied for
+        deadline (float): Optional time.monotonic() deadline, DeadlineExceeded is raised when it is missed
         
     Returns:
         Dict[str, Any]: Personalized feedback response
     """
-    client = Groq(api_key="put you api key")
+    client = Groq(api_key="put you api key", **client_options(deadline, "llm"))
     model = "meta-llama/llama-4-scout-17b-16e-instruct"
     
     try:
@@ -49,14 +28,14 @@ def generate_resume_feedback_with_groq(eligibility_result: Dict[str, Any], resum
                 "error": eligibility_result['error']
             }
         
-        # Extract key information and convert numpy types
+        # Extract key information
         is_eligible = eligibility_result.get('eligible', False)
         predicted_category = eligibility_result.get('predicted_category', '')
         confidence_for_target = float(eligibility_result.get('confidence_for_target', 0))  # Convert to float
         eligibility_score = eligibility_result.get('eligibility_score', '')
-        all_scores = convert_numpy_types(eligibility_result.get('all_category_scores', {}))  # Convert nested values
+        all_scores = eligibility_result.get('all_category_scores', {})
         
-        sorted_categories = sorted(all_scores.items(), key=lambda x: x[1], reverse=True)[:3]
+        sorted_categories = eligibility_result.get('top_categories') or sorted(all_scores.items(), key=lambda x: x[1], reverse=True)[:3]
         
         if is_eligible:
             system_prompt = """
@@ -137,6 +116,7 @@ def generate_resume_feedback_with_groq(eligibility_result: Dict[str, Any], resum
             }
         ]
         
+        started_at = time.perf_counter()
         response = client.chat.completions.create(
             model=model,
             messages=messages,
@@ -153,27 +133,28 @@ def generate_resume_feedback_with_groq(eligibility_result: Dict[str, Any], resum
             "confidence_score": f"{confidence_for_target:.1%}",
             "rating": eligibility_score,
             "best_fit_category": predicted_category,
-            "target_category": target_category
+            "target_category": target_category,
+            "llm_stats": _usage_stats(response, started_at)
         }
         
+    except APITimeoutError:
+        raise DeadlineExceeded("llm")
+        
     except Exception as e:
         return {
             "success": False,
             "error": f"Failed to generate feedback: {str(e)}"
         }
 
-def generate_detailed_resume_analysis_with_groq(eligibility_result: Dict[str, Any], resume_text: str, target_category: str) -> Dict[str, Any]:
+def generate_detailed_resume_analysis_with_groq(eligibility_result: Dict[str, Any], resume_text: str, target_category: str, deadline: float = None) -> Dict[str, Any]:
     
-    client = Groq(api_key="put you api key")
+    client = Groq(api_key="put you api key", **client_options(deadline, "llm"))
     model = "meta-llama/llama-4-scout-17b-16e-instruct"
     
     
     try:
-        # Convert the ENTIRE eligibility_result at the very beginning
-        clean_eligibility_result = convert_numpy_types(eligibility_result)
-        
-        is_eligible = clean_eligibility_result.get('eligible', False)
-        all_scores = clean_eligibility_result.get('all_category_scores', {})
+        is_eligible = eligibility_result.get('eligible', False)
+        all_scores = eligibility_result.get('all_category_scores', {})
         
         system_prompt = """
         You are an expert resume analyst and career counselor. Provide detailed, actionable analysis
@@ -220,6 +201,7 @@ def generate_detailed_resume_analysis_with_groq(eligibility_result: Dict[str, An
             {"role": "user", "content": user_prompt}
         ]
         
+        started_at = time.perf_counter()
         response = client.chat.completions.create(
             model=model,
             messages=messages,
@@ -230,13 +212,237 @@ def generate_detailed_resume_analysis_with_groq(eligibility_result: Dict[str, An
         return {
             "success": True,
             "detailed_analysis": response.choices[0].message.content,
-            "eligibility_data": clean_eligibility_result  # Already converted
+            "eligibility_data": eligibility_result,
+            "llm_stats": _usage_stats(response, started_at)
         }
         
+    except APITimeoutError:
+        raise DeadlineExceeded("llm")
+        
     except Exception as e:
         print(f"Detailed analysis error: {str(e)}")
         print(f"Error type: {type(e)}")
         return {
             "success": False,
             "error": f"Failed to generate detailed analysis: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+DETAILED_ANALYSIS_SECTIONS = [
+    ("strengths", "STRENGTHS"),
+    ("weaknesses", "WEAKNESSES"),
+    ("missing_elements", "MISSING ELEMENTS"),
+    ("specific_recommendations", "SPECIFIC RECOMMENDATIONS"),
+    ("keyword_suggestions", "KEYWORD SUGGESTIONS"),
+    ("formatting_tips", "FORMATTING TIPS"),
+]
+
+
+def _usage_stats(response, started_at: float) -> Dict[str, Any]:
+    """Latency and token usage of a single Groq completion"""
+    usage = getattr(response, 'usage', None)
+    return {
+        "calls": 1,
+        "latency_ms": round((time.perf_counter() - started_at) * 1000, 1),
+        "prompt_tokens": getattr(usage, 'prompt_tokens', 0) or 0,
+        "completion_tokens": getattr(usage, 'completion_tokens', 0) or 0,
+        "total_tokens": getattr(usage, 'total_tokens', 0) or 0,
+    }
+
+
+def _combine_usage_stats(first: Dict[str, Any], second: Dict[str, Any], started_at: float) -> Dict[str, Any]:
+    """Sum the usage of two sequential completions"""
+    stats = {
+        key: first.get(key, 0) + second.get(key, 0)
+        for key in ("calls", "prompt_tokens", "completion_tokens", "total_tokens")
+    }
+    stats["latency_ms"] = round((time.perf_counter() - started_at) * 1000, 1)
+    return stats
+
+
+def _validate_combined_payload(payload: Any) -> Dict[str, Any]:
+    """
+    Check the JSON returned by the combined prompt and normalise it.
+    Raises ValueError when a required field is missing or has the wrong type.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Combined response is not a JSON object")
+
+    feedback = payload.get('feedback')
+    if not isinstance(feedback, str) or not feedback.strip():
+        raise ValueError("Combined response is missing 'feedback' text")
+
+    analysis = payload.get('detailed_analysis')
+    if not isinstance(analysis, dict):
+        raise ValueError("Combined response is missing 'detailed_analysis' object")
+
+    sections = {}
+    for key, _ in DETAILED_ANALYSIS_SECTIONS:
+        value = analysis.get(key)
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list) or not value or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"Section '{key}' must be a non-empty list of strings")
+        sections[key] = [item.strip() for item in value if item.strip()]
+
+    return {"feedback": feedback.strip(), "sections": sections}
+
+
+def _format_detailed_analysis(sections: Dict[str, list]) -> str:
+    """Render the six analysis sections as the same numbered text the two-call path returns"""
+    blocks = []
+    for number, (key, title) in enumerate(DETAILED_ANALYSIS_SECTIONS, start=1):
+        items = "\n".join([f"- {item}" for item in sections[key]])
+        blocks.append(f"{number}. {title}:\n{items}")
+    return "\n\n".join(blocks)
+
+
+def _two_call_resume_feedback(eligibility_result: Dict[str, Any], resume_text: str, target_category: str, deadline: float = None) -> Dict[str, Any]:
+    """Original path: one completion for the feedback and one for the detailed analysis"""
+    started_at = time.perf_counter()
+    feedback_result = generate_resume_feedback_with_groq(eligibility_result, resume_text, target_category, deadline)
+    if not feedback_result.get('success'):
+        return {"success": False, "error": feedback_result.get('error', 'Failed to generate feedback')}
+
+    detailed_analysis_result = generate_detailed_resume_analysis_with_groq(eligibility_result, resume_text, target_category, deadline)
+    if not detailed_analysis_result.get('success'):
+        return {"success": False, "error": detailed_analysis_result['error']}
+
+    return {
+        "success": True,
+        "mode": "two_call",
+        "feedback": feedback_result,
+        "detailed_analysis": detailed_analysis_result,
+        "llm_stats": _combine_usage_stats(
+            feedback_result.get('llm_stats', {}),
+            detailed_analysis_result.get('llm_stats', {}),
+            started_at
+        )
+    }
+
+
+def generate_combined_resume_feedback_with_groq(eligibility_result: Dict[str, Any], resume_text: str, target_category: str, deadline: float = None) -> Dict[str, Any]:
+    """
+    Generate the short feedback and the six-section detailed analysis in a single
+    structured JSON completion. Falls back to the two-call path when the model
+    output cannot be parsed or does not match the expected schema.
+
+    Args:
+        eligibility_result (Dict): Result from check_eligibility function
+        resume_text (str): Original resume text extracted from image
+        target_category (str): Target job category applied for
+        deadline (float): Optional time.monotonic() deadline, DeadlineExceeded is raised when it is missed
+
+    Returns:
+        Dict[str, Any]: {"success", "mode", "feedback", "detailed_analysis", "llm_stats"} where
+        "feedback" and "detailed_analysis" have the same shape as the results of
+        generate_resume_feedback_with_groq and generate_detailed_resume_analysis_with_groq
+    """
+    client = Groq(api_key="put you api key", **client_options(deadline, "llm"))
+    model = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+    if 'error' in eligibility_result:
+        return {
+            "success": False,
+            "error": eligibility_result['error']
+        }
+
+    is_eligible = eligibility_result.get('eligible', False)
+    predicted_category = eligibility_result.get('predicted_category', '')
+    confidence_for_target = float(eligibility_result.get('confidence_for_target', 0))
+    eligibility_score = eligibility_result.get('eligibility_score', '')
+    all_scores = eligibility_result.get('all_category_scores', {})
+
+    sorted_categories = eligibility_result.get('top_categories') or sorted(all_scores.items(), key=lambda x: x[1], reverse=True)[:3]
+    scores_text = "\n".join([f"  {category}: {float(score):.1%}" for category, score in all_scores.items()])
+    section_keys = ", ".join([f'"{key}"' for key, _ in DETAILED_ANALYSIS_SECTIONS])
+
+    system_prompt = f"""
+    You are an expert resume analyst and a friendly, encouraging career counselor.
+    You answer with a single JSON object and nothing else, using exactly this schema:
+    {{
+      "feedback": "<200-300 word personalised feedback in a conversational tone>",
+      "detailed_analysis": {{
+        "strengths": ["..."],
+        "weaknesses": ["..."],
+        "missing_elements": ["..."],
+        "specific_recommendations": ["..."],
+        "keyword_suggestions": ["..."],
+        "formatting_tips": ["..."]
+      }}
+    }}
+    Every list in "detailed_analysis" ({section_keys}) must contain at least one string.
+    """
+
+    user_prompt = f"""
+    Analyze this resume for a {target_category} position.
+
+    ELIGIBILITY STATUS: {"✅ ELIGIBLE" if is_eligible else "❌ NEEDS IMPROVEMENT"}
+    CONFIDENCE SCORE: {confidence_for_target:.1%}
+    ELIGIBILITY RATING: {eligibility_score}
+    PREDICTED BEST FIT: {predicted_category}
+
+    TOP CATEGORY MATCHES:
+    {chr(10).join([f"• {cat}: {float(score):.1%}" for cat, score in sorted_categories])}
+
+    CATEGORY SCORES:
+{scores_text}
+
+    RESUME CONTENT:
+    {resume_text}
+
+    "feedback": {f"congratulate the candidate, explain why the resume suits {target_category} and give positive next steps." if is_eligible else f"be constructive, explain what to strengthen for {target_category}, mention {predicted_category} as an alternative path and end with encouragement."}
+    "detailed_analysis": specific, actionable and professional points for each section.
+    """
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+    started_at = time.perf_counter()
+    response = None
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=2000,
+            temperature=0.5,
+            response_format={"type": "json_object"}
+        )
+        llm_stats = _usage_stats(response, started_at)
+
+        parsed = _validate_combined_payload(json.loads(response.choices[0].message.content))
+
+    except APITimeoutError:
+        # Out of time, the two-call fallback would not finish either
+        raise DeadlineExceeded("llm")
+
+    except Exception as e:
+        print(f"Combined feedback failed, falling back to two calls: {str(e)}")
+        # The failed attempt still cost time (and tokens when a response came back)
+        failed_stats = _usage_stats(response, started_at)
+        result = _two_call_resume_feedback(eligibility_result, resume_text, target_category, deadline)
+        result["llm_stats"] = _combine_usage_stats(failed_stats, result.get("llm_stats", {}), started_at)
+        result["llm_stats"]["failed_combined_call"] = failed_stats
+        return result
+
+    return {
+        "success": True,
+        "mode": "combined",
+        "feedback": {
+            "success": True,
+            "feedback": parsed['feedback'],
+            "eligibility_status": "eligible" if is_eligible else "needs_improvement",
+            "confidence_score": f"{confidence_for_target:.1%}",
+            "rating": eligibility_score,
+            "best_fit_category": predicted_category,
+            "target_category": target_category
+        },
+        "detailed_analysis": {
+            "success": True,
+            "detailed_analysis": _format_detailed_analysis(parsed['sections']),
+            "sections": parsed['sections'],
+            "eligibility_data": eligibility_result
+        },
+        "llm_stats": llm_stats
+    }
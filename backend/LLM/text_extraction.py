@@ -1,13 +1,16 @@
-from groq import Groq
+from groq import Groq, APITimeoutError
 from typing import Dict, Any
 import base64
 import io
 from PIL import Image
 import re
+from metrics import trace_stage
+from admission import DeadlineExceeded, client_options
 
-def extract_resume_text_with_groq_for_ml(base64_image: str) -> Dict[str, Any]:
+def extract_resume_text_with_groq_for_ml(base64_image: str, deadline: float = None) -> Dict[str, Any]:
     
-    client = Groq(api_key="put your api key")
+    # Bounded by the request deadline (time.monotonic() value) when one is given
+    client = Groq(api_key="put your api key", **client_options(deadline, "ocr"))
     model = "meta-llama/llama-4-scout-17b-16e-instruct"
     
     try:
@@ -18,8 +21,9 @@ def extract_resume_text_with_groq_for_ml(base64_image: str) -> Dict[str, Any]:
             base64_image = base64_image.split(',')[1]
         
         try:
-            image_data = base64.b64decode(base64_image)
-            Image.open(io.BytesIO(image_data))  # Just to validate
+            with trace_stage("image_decode"):
+                image_data = base64.b64decode(base64_image)
+                Image.open(io.BytesIO(image_data))  # Just to validate
         except Exception as img_error:
             return {"success": False, "error": f"Invalid image data: {str(img_error)}"}
 
@@ -53,12 +57,13 @@ def extract_resume_text_with_groq_for_ml(base64_image: str) -> Dict[str, Any]:
             }
         ]
 
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            max_tokens=3000,
-            temperature=0.1
-        )
+        with trace_stage("groq_ocr"):
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=3000,
+                temperature=0.1
+            )
 
         raw_text = response.choices[0].message.content
         
@@ -72,6 +77,9 @@ def extract_resume_text_with_groq_for_ml(base64_image: str) -> Dict[str, Any]:
             "message": "Resume text extracted and cleaned for ML model"
         }
 
+    except APITimeoutError:
+        raise DeadlineExceeded("ocr")
+
     except Exception as e:
         return {"success": False, "error": f"Text extraction failed: {str(e)}"}
 
@@ -1,5 +1,6 @@
-from tensorflow.keras.models import Sequential
+from tensorflow.keras.models import Sequential, Model
 from tensorflow.keras.layers import Embedding, Bidirectional, LSTM, Dense, Dropout, BatchNormalization
+from tensorflow.keras.layers import Input, Conv1D, GlobalMaxPooling1D, GlobalAveragePooling1D, Activation
 
 
 
@@ -58,4 +59,39 @@ def create_model(vocab_size=15000, max_length=500, num_classes=25, embedding_dim
     print("Model architecture:")
    
     
-    return model, model.summary()  #return this model, and its architecture details 
\ No newline at end of file
+    return model, model.summary()  #return this model, and its architecture details 
+
+
+def create_student_model(vocab_size=15000, max_length=500, num_classes=25, embedding_dim=64, architecture='cnn', filters=128, kernel_size=5):
+    """
+    Small classifier distilled from the BiLSTM (see distill.py).
+
+    "cnn" is one convolution over the word embeddings with global max pooling,
+    "pooled" just averages the word embeddings. Both end in a 32-unit dense_4
+    layer like the teacher, so the same EMBEDDING_LAYER works for similarity
+    search, and a separate softmax layer so training can use the logits.
+
+    Returns:
+        (model, logits_model): model outputs probabilities and is what gets saved,
+        logits_model shares its weights and outputs the pre-softmax scores
+    """
+    inputs = Input(shape=(max_length,), dtype='int32', name='tokens')
+    # Padding is masked out of the average, the convolution does not use masks
+    x = Embedding(input_dim=vocab_size, output_dim=embedding_dim, mask_zero=architecture == 'pooled', name='embedding')(inputs)
+
+    if architecture == 'cnn':
+        x = Conv1D(filters, kernel_size, activation='relu', padding='same', name='conv_1')(x)
+        x = GlobalMaxPooling1D(name='max_pool')(x)
+    elif architecture == 'pooled':
+        x = GlobalAveragePooling1D(name='average_pool')(x)
+    else:
+        raise ValueError(f"Unknown student architecture '{architecture}', expected cnn or pooled")
+
+    x = Dropout(0.3, name='dropout_1')(x)
+    x = Dense(32, activation='relu', name='dense_4')(x)
+    logits = Dense(num_classes, name='logits')(x)
+    outputs = Activation('softmax', name='output')(logits)
+
+    model = Model(inputs, outputs, name=f'student_{architecture}')
+    model.compile(loss='sparse_categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
+    return model, Model(inputs, logits, name=f'student_{architecture}_logits')
@@ -0,0 +1,129 @@
+import json
+import os
+import numpy as np
+
+# Lower edges of each suitability level, checked against the confidence for the target category
+DEFAULT_THRESHOLDS = [0.15, 0.3, 0.5, 0.7]
+SUITABILITY_LEVELS = ["NOT SUITABLE", "LESS SUITABLE", "MODERATELY SUITABLE", "SUITABLE", "HIGHLY SUITABLE"]
+# Target confidence from which a non-matching prediction is still recommended
+DEFAULT_RECOMMEND_THRESHOLD = 0.5
+
+
+class EligibilityDecisionEngine:
+    """
+    Turns model softmax outputs into eligibility decisions with NumPy.
+
+    Category lookups and threshold arrays are built once, so a decision for a
+    whole batch is an argmax, a gather and a searchsorted. Thresholds can be
+    calibrated per category through a JSON config:
+
+        {
+          "default": [0.15, 0.3, 0.5, 0.7],
+          "recommend": 0.5,
+          "categories": {
+            "Data Scientist": {"thresholds": [0.2, 0.35, 0.55, 0.75], "recommend": 0.55}
+          }
+        }
+    """
+
+    def __init__(self, categories, thresholds=None, recommend_threshold=DEFAULT_RECOMMEND_THRESHOLD, category_overrides=None):
+        self.categories = list(categories)
+        self.category_index = {category: i for i, category in enumerate(self.categories)}
+        self.levels = np.array(SUITABILITY_LEVELS, dtype=object)
+
+        default_edges = np.asarray(thresholds if thresholds is not None else DEFAULT_THRESHOLDS, dtype=np.float64)
+        if default_edges.shape != (len(SUITABILITY_LEVELS) - 1,) or np.any(np.diff(default_edges) <= 0):
+            raise ValueError(f"Thresholds must be {len(SUITABILITY_LEVELS) - 1} strictly increasing values, got {default_edges.tolist()}")
+
+        # (num_classes, num_levels - 1) threshold table and per-class recommend threshold
+        self.threshold_table = np.tile(default_edges, (len(self.categories), 1))
+        self.recommend_thresholds = np.full(len(self.categories), float(recommend_threshold))
+
+        for category, override in (category_overrides or {}).items():
+            if category not in self.category_index:
+                raise ValueError(f"Threshold override for unknown category '{category}'")
+            i = self.category_index[category]
+            if 'thresholds' in override:
+                edges = np.asarray(override['thresholds'], dtype=np.float64)
+                if edges.shape != default_edges.shape or np.any(np.diff(edges) <= 0):
+                    raise ValueError(f"Thresholds for '{category}' must be {default_edges.size} strictly increasing values")
+                self.threshold_table[i] = edges
+            if 'recommend' in override:
+                self.recommend_thresholds[i] = float(override['recommend'])
+
+        # Without per-category calibration a single searchsorted over the shared edges is enough
+        self.default_edges = default_edges
+        self.shared_thresholds = bool(np.all(self.threshold_table == default_edges))
+
+    @classmethod
+    def from_config(cls, categories, config_path=None):
+        """Build the engine from a JSON threshold file, or with the defaults when there is none"""
+        if not config_path or not os.path.exists(config_path):
+            return cls(categories)
+        with open(config_path) as f:
+            config = json.load(f)
+        return cls(
+            categories,
+            thresholds=config.get('default'),
+            recommend_threshold=config.get('recommend', DEFAULT_RECOMMEND_THRESHOLD),
+            category_overrides=config.get('categories')
+        )
+
+    def target_indices(self, target_categories):
+        """Map category names to prediction columns, -1 for unknown categories"""
+        return np.fromiter((self.category_index.get(c, -1) for c in target_categories), dtype=np.int64, count=len(target_categories))
+
+    def suitability_levels(self, confidences, target_indices):
+        """Level index (0 = NOT SUITABLE ... 4 = HIGHLY SUITABLE) for each target confidence"""
+        if self.shared_thresholds:
+            return np.searchsorted(self.default_edges, confidences, side='right')
+        return (confidences[:, None] >= self.threshold_table[target_indices]).sum(axis=1)
+
+    def decide(self, predictions, target_indices):
+        """
+        Vectorised eligibility for a batch.
+
+        Args:
+            predictions (np.ndarray): (batch, num_classes) softmax outputs
+            target_indices (np.ndarray): (batch,) target columns, all valid
+
+        Returns:
+            Dict[str, np.ndarray]: predicted_idx, overall_confidence, target_confidence,
+            eligible, recommended and level (suitability label) per row
+        """
+        predictions = np.asarray(predictions)
+        target_indices = np.asarray(target_indices)
+        rows = np.arange(predictions.shape[0])
+
+        predicted_idx = predictions.argmax(axis=1)
+        overall_confidence = predictions[rows, predicted_idx]
+        target_confidence = predictions[rows, target_indices]
+
+        eligible = predicted_idx == target_indices
+        level_idx = self.suitability_levels(target_confidence, target_indices)
+        # A prediction that matches the target is always the top level
+        level_idx = np.where(eligible, len(SUITABILITY_LEVELS) - 1, level_idx)
+        recommended = eligible | (target_confidence >= self.recommend_thresholds[target_indices])
+
+        return {
+            'predicted_idx': predicted_idx,
+            'overall_confidence': overall_confidence,
+            'target_confidence': target_confidence,
+            'eligible': eligible,
+            'recommended': recommended,
+            'level': self.levels[level_idx]
+        }
+
+    def top_k(self, predictions, k=3):
+        """
+        Indices of the k highest scores per row, best first. Uses argpartition so
+        only the k winners are sorted, not the full class vector. k above the
+        number of classes returns all of them.
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        predictions = np.atleast_2d(predictions)
+        k = min(k, predictions.shape[1])
+        top = np.argpartition(predictions, -k, axis=1)[:, -k:]
+        order = np.argsort(-np.take_along_axis(predictions, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
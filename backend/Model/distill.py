@@ -0,0 +1,238 @@
+from create_model import create_student_model
+from incremental_train import load_labelled_csv
+from text_preprocessing import clean_text
+from tensorflow.keras.models import load_model
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+from sklearn.model_selection import train_test_split
+import tensorflow as tf
+import pandas as pd
+import numpy as np
+import argparse
+import datetime
+import json
+import pickle
+import time
+import os
+
+
+def soften(probabilities, temperature):
+    """
+    Teacher softmax at a higher temperature. The saved teacher only outputs
+    probabilities, and softmax(logits / T) is the same as p ** (1 / T) renormalised.
+    """
+    softened = np.power(np.clip(probabilities, 1e-12, 1.0), 1.0 / temperature)
+    return (softened / softened.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def distillation_loss(num_classes, temperature, alpha):
+    """
+    Loss on the student's logits. y_true holds the softened teacher
+    distribution followed by the one-hot label (all zeros for unlabelled rows,
+    which then only learn from the teacher).
+    """
+    def loss(y_true, logits):
+        soft_targets, hard_targets = y_true[:, :num_classes], y_true[:, num_classes:]
+        log_student_soft = tf.nn.log_softmax(logits / temperature)
+        kl = tf.reduce_sum(soft_targets * (tf.math.log(tf.clip_by_value(soft_targets, 1e-12, 1.0)) - log_student_soft), axis=-1)
+        ce = -tf.reduce_sum(hard_targets * tf.nn.log_softmax(logits), axis=-1)
+        # T^2 keeps the soft-target gradients on the same scale as the hard-label ones
+        return alpha * temperature ** 2 * kl + (1 - alpha) * ce
+    return loss
+
+
+def latency_ms(model, X, batch_size, repeats=20):
+    """
+    Median latency of one batch of batch_size rows, through model.predict (the
+    serving call, which has a fixed per-call overhead) and through a traced
+    graph call (the model's own compute)
+    """
+    batch = X[:batch_size]
+    if len(batch) < batch_size:
+        batch = np.resize(batch, (batch_size, X.shape[1]))
+    graph_call = tf.function(lambda padded: model(padded, training=False))
+    tensor = tf.constant(batch, dtype=tf.int32)
+
+    timings = {}
+    for name, call in (('predict', lambda: model.predict(batch, verbose=0)), ('graph', lambda: graph_call(tensor).numpy())):
+        call()
+        samples = []
+        for _ in range(repeats):
+            started_at = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - started_at) * 1000)
+        timings[name] = float(np.median(samples))
+    return timings
+
+
+def distill(csv_file_path, teacher_path="final_resume_model.h5", output_path="student_resume_model.h5",
+            architecture='cnn', unlabelled_csv_path=None, epochs=30, batch_size=32, temperature=4.0,
+            alpha=0.7, learning_rate=1e-3, min_retained=0.95, validation_split=0.15):
+    """
+    Train a small student classifier on the BiLSTM teacher's softmax outputs.
+
+    The student reuses tokenizer.pkl, label_encoder.pkl and model_config.pkl, so
+    serving it only takes pointing MODEL_PATH (or serve.py --model-path) at
+    output_path. Training rows are the original training split (same seed and
+    stratification as text_preprocessing) plus, optionally, unlabelled resumes
+    that only the teacher labels. Early stopping uses a validation slice of the
+    training rows and the held-out split is only used for the report. The
+    student is only saved when it keeps at least min_retained of the teacher's
+    held-out accuracy.
+
+    Args:
+        csv_file_path (str): CSV with 'Resume' and 'Category' columns the teacher was trained on
+        teacher_path (str): Trained BiLSTM model
+        output_path (str): Where to save the student
+        architecture (str): "cnn" or "pooled", see create_student_model
+        unlabelled_csv_path (str): Optional CSV with a 'Resume' column, labelled by the teacher only
+        temperature (float): Softmax temperature for the teacher targets
+        alpha (float): Weight of the teacher targets against the true labels
+        validation_split (float): Share of the training rows used for early stopping
+
+    Returns:
+        Dict: Report with accuracy, agreement with the teacher, latency and size of both models
+    """
+    print("🚀 Starting model distillation...")
+    print("=" * 60)
+
+    with open('tokenizer.pkl', 'rb') as f:
+        tokenizer = pickle.load(f)
+    with open('label_encoder.pkl', 'rb') as f:
+        label_encoder = pickle.load(f)
+    with open('model_config.pkl', 'rb') as f:
+        config = pickle.load(f)
+    max_length = config['max_length']
+    num_classes = len(label_encoder.classes_)
+
+    def encode(texts):
+        return pad_sequences(tokenizer.texts_to_sequences(texts), maxlen=max_length, padding='post', truncating='post')
+
+    print("\n🔹 Rebuilding the original train/test split...")
+    df, _ = load_labelled_csv(csv_file_path, label_encoder)
+    X = encode(df['cleaned_resume'])
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, df['encoded_label'].values, test_size=0.2, stratify=df['encoded_label'].values, random_state=42
+    )
+
+    hard_train = np.eye(num_classes, dtype=np.float32)[y_train]
+    if unlabelled_csv_path:
+        unlabelled = pd.read_csv(unlabelled_csv_path)['Resume'].apply(clean_text)
+        X_unlabelled = encode(unlabelled[unlabelled.str.len() > 0])
+        print(f"Adding {len(X_unlabelled)} unlabelled rows labelled by the teacher")
+        X_train = np.concatenate([X_train, X_unlabelled])
+        hard_train = np.concatenate([hard_train, np.zeros((len(X_unlabelled), num_classes), dtype=np.float32)])
+
+    print("\n🔹 Computing teacher predictions...")
+    teacher = load_model(teacher_path)
+    teacher_train = teacher.predict(X_train, batch_size=64, verbose=0)
+    teacher_test = teacher.predict(X_test, batch_size=64, verbose=0)
+    targets_train = np.concatenate([soften(teacher_train, temperature), hard_train], axis=1)
+    # Early stopping picks its epoch on rows split off the training data, so the
+    # held-out split stays unseen until the comparison with the teacher
+    X_fit, X_val, targets_fit, targets_val = train_test_split(X_train, targets_train, test_size=validation_split, random_state=42)
+
+    print(f"\n🔹 Training {architecture} student (T={temperature}, alpha={alpha})...")
+    student, student_logits = create_student_model(
+        vocab_size=config.get('vocab_size', 15000),
+        max_length=max_length,
+        num_classes=num_classes,
+        architecture=architecture
+    )
+    student_logits.compile(loss=distillation_loss(num_classes, temperature, alpha), optimizer=Adam(learning_rate=learning_rate))
+    history = student_logits.fit(
+        X_fit, targets_fit,
+        validation_data=(X_val, targets_val),
+        epochs=epochs,
+        batch_size=batch_size,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True, verbose=1)],
+        verbose=1
+    )
+
+    print("\n🔹 Comparing student and teacher...")
+    student_test = student.predict(X_test, batch_size=64, verbose=0)
+    teacher_accuracy = float(np.mean(teacher_test.argmax(axis=1) == y_test))
+    student_accuracy = float(np.mean(student_test.argmax(axis=1) == y_test))
+    agreement = float(np.mean(student_test.argmax(axis=1) == teacher_test.argmax(axis=1)))
+    retained = student_accuracy / teacher_accuracy if teacher_accuracy else 0.0
+
+    latency = {}
+    for name, model in (('teacher', teacher), ('student', student)):
+        for size in (1, 64):
+            for call, value in latency_ms(model, X_test, size).items():
+                latency[f'{name}_{call}_batch_{size}_ms'] = round(value, 2)
+    speedup = {
+        key.replace('teacher_', '').replace('_ms', ''): round(value / latency[key.replace('teacher', 'student')], 2)
+        for key, value in latency.items() if key.startswith('teacher')
+    }
+
+    print(f"Held-out accuracy: teacher {teacher_accuracy:.4f}, student {student_accuracy:.4f} ({retained:.1%} retained)")
+    print(f"Agreement with teacher: {agreement:.1%}")
+    for key, factor in speedup.items():
+        print(f"{key}: teacher {latency[f'teacher_{key}_ms']:.1f} ms, student {latency[f'student_{key}_ms']:.1f} ms ({factor:.1f}x faster)")
+    print(f"Parameters: teacher {teacher.count_params():,}, student {student.count_params():,}")
+
+    saved = retained >= min_retained
+    if saved:
+        print(f"\n🔹 Saving student model to {output_path}...")
+        student.save(output_path)
+    else:
+        print(f"\n❌ Student keeps less than {min_retained:.0%} of the teacher's accuracy, not saving it")
+
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'teacher_path': teacher_path,
+        'student_path': output_path,
+        'architecture': architecture,
+        'temperature': temperature,
+        'alpha': alpha,
+        'train_rows': int(len(X_fit)),
+        'validation_rows': int(len(X_val)),
+        'epochs_run': len(history.history['loss']),
+        'teacher_accuracy': round(teacher_accuracy, 4),
+        'student_accuracy': round(student_accuracy, 4),
+        'accuracy_retained': round(retained, 4),
+        'teacher_agreement': round(agreement, 4),
+        'teacher_params': int(teacher.count_params()),
+        'student_params': int(student.count_params()),
+        'latency_ms': latency,
+        'speedup': speedup,
+        'saved': saved
+    }
+    if saved:
+        report['student_file_mb'] = round(os.path.getsize(output_path) / 1e6, 2)
+        if os.path.exists(teacher_path):
+            report['teacher_file_mb'] = round(os.path.getsize(teacher_path) / 1e6, 2)
+
+    config.setdefault('distillations', []).append(report)
+    with open('model_config.pkl', 'wb') as f:
+        pickle.dump(config, f)
+
+    print("\n✅ Distillation finished")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distil the BiLSTM resume model into a small student model")
+    parser.add_argument('--csv', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gpt_dataset.csv'))
+    parser.add_argument('--teacher-path', default='final_resume_model.h5')
+    parser.add_argument('--output-path', default='student_resume_model.h5')
+    parser.add_argument('--architecture', choices=['cnn', 'pooled'], default='cnn')
+    parser.add_argument('--unlabelled-csv', help="Extra resumes ('Resume' column) labelled by the teacher only")
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--temperature', type=float, default=4.0)
+    parser.add_argument('--alpha', type=float, default=0.7)
+    parser.add_argument('--learning-rate', type=float, default=1e-3)
+    parser.add_argument('--min-retained', type=float, default=0.95)
+    parser.add_argument('--validation-split', type=float, default=0.15)
+    args = parser.parse_args()
+
+    report = distill(
+        args.csv, args.teacher_path, args.output_path, args.architecture, args.unlabelled_csv,
+        epochs=args.epochs, batch_size=args.batch_size, temperature=args.temperature,
+        alpha=args.alpha, learning_rate=args.learning_rate, min_retained=args.min_retained,
+        validation_split=args.validation_split
+    )
+    print(json.dumps(report, indent=2))
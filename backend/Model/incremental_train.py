@@ -0,0 +1,229 @@
+from text_preprocessing import clean_text
+from tensorflow.keras.models import load_model
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+from sklearn.model_selection import train_test_split
+from collections import Counter
+import pandas as pd
+import numpy as np
+import argparse
+import datetime
+import json
+import pickle
+import os
+
+# Above this share of out-of-vocabulary tokens in the new data, a full retrain with main.py is recommended
+OOV_RETRAIN_THRESHOLD = 0.15
+
+
+def load_labelled_csv(csv_file_path, label_encoder):
+    """Read a Resume/Category CSV, clean it and drop rows that are empty or have an unknown category"""
+    df = pd.read_csv(csv_file_path)
+    df['cleaned_resume'] = df['Resume'].apply(clean_text)
+    df = df[df['cleaned_resume'].str.len() > 0]
+
+    known = df['Category'].isin(label_encoder.classes_)
+    unknown_categories = sorted(df.loc[~known, 'Category'].unique().tolist())
+    df = df[known].copy()
+    df['encoded_label'] = label_encoder.transform(df['Category'])
+    return df, unknown_categories
+
+
+def vocabulary_report(texts, tokenizer, vocab_growth_path):
+    """
+    Measure how much of the new text the frozen tokenizer can not represent and
+    accumulate the unseen words in vocab_growth_path so vocabulary drift can be
+    tracked across updates
+    """
+    num_words = tokenizer.num_words or (len(tokenizer.word_index) + 1)
+    total, oov = 0, 0
+    unseen = Counter()
+    for text in texts:
+        for word in text.split():
+            total += 1
+            index = tokenizer.word_index.get(word)
+            if index is None or index >= num_words:
+                oov += 1
+                unseen[word] += 1
+
+    growth = {'updates': 0, 'unseen_words': {}}
+    if os.path.exists(vocab_growth_path):
+        with open(vocab_growth_path) as f:
+            growth = json.load(f)
+    for word, count in unseen.items():
+        growth['unseen_words'][word] = growth['unseen_words'].get(word, 0) + count
+    growth['updates'] += 1
+    with open(vocab_growth_path, 'w') as f:
+        json.dump(growth, f, indent=2)
+
+    return {
+        'tokens': total,
+        'oov_tokens': oov,
+        'oov_rate': round(oov / total, 4) if total else 0.0,
+        'new_unseen_words': len(unseen),
+        'total_unseen_words': len(growth['unseen_words']),
+        'top_unseen_words': [word for word, _ in unseen.most_common(20)]
+    }
+
+
+def incremental_update(new_csv_path, base_csv_path, model_path="final_resume_model.h5", output_path=None,
+                       epochs=5, batch_size=32, replay_ratio=1.0, learning_rate=1e-4, max_regression=0.01,
+                       validation_split=0.15):
+    """
+    Fine-tune the trained model on newly labelled resumes instead of retraining from scratch.
+
+    The tokenizer and label encoder are kept as they are so word ids and class
+    ids stay stable for the serving code. Training uses the new rows plus a replay
+    sample of the original training split to avoid forgetting. The original
+    held-out split (same seed and stratification as text_preprocessing) is
+    evaluated before and after, and the updated model is only saved when it
+    does not lose more than max_regression accuracy there. Early stopping uses a
+    validation slice of the training rows, never the held-out split.
+
+    Args:
+        new_csv_path (str): CSV with 'Resume' and 'Category' columns of new labelled rows
+        base_csv_path (str): CSV the current model was trained on, used for replay and the held-out split
+        model_path (str): Model to start from
+        output_path (str): Where to save the updated model, defaults to model_path
+        replay_ratio (float): Old training rows replayed per new row
+        validation_split (float): Share of the training rows used for early stopping
+
+    Returns:
+        Dict: Report with accuracy before/after, vocabulary drift and whether the model was saved
+    """
+    output_path = output_path or model_path
+
+    print("🚀 Starting incremental model update...")
+    print("=" * 60)
+
+    with open('tokenizer.pkl', 'rb') as f:
+        tokenizer = pickle.load(f)
+    with open('label_encoder.pkl', 'rb') as f:
+        label_encoder = pickle.load(f)
+    with open('model_config.pkl', 'rb') as f:
+        config = pickle.load(f)
+    max_length = config['max_length']
+
+    def encode(texts):
+        return pad_sequences(tokenizer.texts_to_sequences(texts), maxlen=max_length, padding='post', truncating='post')
+
+    print("\n🔹 Rebuilding the original train/test split...")
+    base_df, _ = load_labelled_csv(base_csv_path, label_encoder)
+    X_base = encode(base_df['cleaned_resume'])
+    X_old_train, X_test, y_old_train, y_test = train_test_split(
+        X_base, base_df['encoded_label'].values, test_size=0.2, stratify=base_df['encoded_label'].values, random_state=42
+    )
+
+    print("\n🔹 Loading new labelled rows...")
+    new_df, unknown_categories = load_labelled_csv(new_csv_path, label_encoder)
+    if unknown_categories:
+        print(f"⚠️ Skipping rows with categories the model does not know (needs a full retrain): {unknown_categories}")
+    if len(new_df) == 0:
+        raise ValueError("No usable new rows to train on")
+    print(f"New rows: {len(new_df)}")
+
+    vocab = vocabulary_report(new_df['cleaned_resume'], tokenizer, 'vocab_growth.json')
+    print(f"OOV rate in new data: {vocab['oov_rate']:.1%} ({vocab['new_unseen_words']} unseen words)")
+    if vocab['oov_rate'] > OOV_RETRAIN_THRESHOLD:
+        print(f"⚠️ OOV rate above {OOV_RETRAIN_THRESHOLD:.0%}, consider a full retrain with main.py to refit the tokenizer")
+
+    X_new = encode(new_df['cleaned_resume'])
+    y_new = new_df['encoded_label'].values
+
+    # Hold out part of the new rows too, when there are enough, so the gain on new data is measurable
+    X_new_test, y_new_test = None, None
+    if len(new_df) >= 10:
+        X_new, X_new_test, y_new, y_new_test = train_test_split(X_new, y_new, test_size=0.2, random_state=42)
+
+    rng = np.random.default_rng(42)
+    replay_size = min(len(X_old_train), int(round(replay_ratio * len(X_new))))
+    replay = rng.choice(len(X_old_train), size=replay_size, replace=False)
+    X_train = np.concatenate([X_new, X_old_train[replay]])
+    y_train = np.concatenate([y_new, y_old_train[replay]])
+    # Early stopping picks its epoch on rows split off the training data, so the
+    # held-out split stays unseen until the before/after comparison
+    X_train, X_val, y_train, y_val = train_test_split(X_train, y_train, test_size=validation_split, random_state=42)
+    print(f"Training on {len(X_new)} new + {replay_size} replayed rows ({len(X_val)} kept for validation)")
+
+    model = load_model(model_path)
+
+    print("\n🔹 Evaluating current model...")
+    _, accuracy_before = model.evaluate(X_test, y_test, verbose=0)
+    new_accuracy_before = model.evaluate(X_new_test, y_new_test, verbose=0)[1] if X_new_test is not None else None
+
+    # Lower learning rate than the original training, we only want to nudge the weights
+    model.compile(loss='sparse_categorical_crossentropy', optimizer=Adam(learning_rate=learning_rate), metrics=['accuracy'])
+
+    print(f"\n🔹 Fine-tuning for up to {epochs} epochs...")
+    history = model.fit(
+        X_train, y_train,
+        validation_data=(X_val, y_val),
+        epochs=epochs,
+        batch_size=batch_size,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=2, restore_best_weights=True, verbose=1)],
+        verbose=1
+    )
+
+    test_loss, accuracy_after = model.evaluate(X_test, y_test, verbose=0)
+    new_accuracy_after = model.evaluate(X_new_test, y_new_test, verbose=0)[1] if X_new_test is not None else None
+
+    accuracy_delta = accuracy_after - accuracy_before
+    print(f"\nHeld-out accuracy: {accuracy_before:.4f} -> {accuracy_after:.4f} ({accuracy_delta:+.4f})")
+    if new_accuracy_before is not None:
+        print(f"New-data accuracy: {new_accuracy_before:.4f} -> {new_accuracy_after:.4f}")
+
+    saved = accuracy_delta >= -max_regression
+    if saved:
+        print(f"\n🔹 Saving updated model to {output_path}...")
+        model.save(output_path)
+        config['test_accuracy'] = accuracy_after
+        config['test_loss'] = test_loss
+    else:
+        print(f"\n❌ Accuracy dropped by more than {max_regression:.2%}, keeping the current model")
+
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'new_rows': int(len(new_df)),
+        'replayed_rows': int(replay_size),
+        'validation_rows': int(len(X_val)),
+        'skipped_categories': unknown_categories,
+        'epochs_run': len(history.history['loss']),
+        'heldout_accuracy_before': round(float(accuracy_before), 4),
+        'heldout_accuracy_after': round(float(accuracy_after), 4),
+        'heldout_accuracy_delta': round(float(accuracy_delta), 4),
+        'new_data_accuracy_before': None if new_accuracy_before is None else round(float(new_accuracy_before), 4),
+        'new_data_accuracy_after': None if new_accuracy_after is None else round(float(new_accuracy_after), 4),
+        'vocabulary': vocab,
+        'saved': saved
+    }
+
+    config.setdefault('incremental_updates', []).append(report)
+    with open('model_config.pkl', 'wb') as f:
+        pickle.dump(config, f)
+
+    print("\n✅ Incremental update finished")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fine-tune the resume model on newly labelled rows")
+    parser.add_argument('new_csv', help="CSV with new 'Resume' and 'Category' rows")
+    parser.add_argument('--base-csv', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gpt_dataset.csv'))
+    parser.add_argument('--model-path', default='final_resume_model.h5')
+    parser.add_argument('--output-path')
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--replay-ratio', type=float, default=1.0)
+    parser.add_argument('--learning-rate', type=float, default=1e-4)
+    parser.add_argument('--max-regression', type=float, default=0.01)
+    parser.add_argument('--validation-split', type=float, default=0.15)
+    args = parser.parse_args()
+
+    report = incremental_update(
+        args.new_csv, args.base_csv, args.model_path, args.output_path,
+        epochs=args.epochs, batch_size=args.batch_size, replay_ratio=args.replay_ratio,
+        learning_rate=args.learning_rate, max_regression=args.max_regression,
+        validation_split=args.validation_split
+    )
+    print(json.dumps(report, indent=2))
@@ -1,91 +1,278 @@
 import re
 import numpy as np
-from tensorflow.keras.models import load_model
+import tensorflow as tf
+from tensorflow.keras.models import load_model, Model
 import pickle
 from tensorflow.keras.preprocessing.sequence import pad_sequences
+import os
+import threading
+import time
+from Model.decision import EligibilityDecisionEngine
+from metrics import trace_stage, increment, record_cache, set_gauge
 
-def check_eligibility(resume_text, target_category, model_path="final_resume_model.h5", threshold=0.3):
-    model = load_model(model_path)
-    
-    with open('tokenizer.pkl', 'rb') as f:
-        tokenizer = pickle.load(f)
-    
-    with open('label_encoder.pkl', 'rb') as f:
-        label_encoder = pickle.load(f)
-    
-    with open('model_config.pkl', 'rb') as f:
-        config = pickle.load(f)
-
-    # Clean and preprocess text
-    def clean_text(text):
-        text = re.sub(r'<.*?>', '', text)
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-        text = re.sub(r'\S+@\S+', '', text)
-        text = re.sub(r'[^a-zA-Z\s]', '', text)
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text.lower()
-
-    cleaned_text = clean_text(resume_text)
-
-    # Tokenize and pad
-    sequence = tokenizer.texts_to_sequences([cleaned_text])
-    padded = pad_sequences(sequence, maxlen=config['max_length'], padding='post', truncating='post')
+# Loaded artifacts, filled once per process instead of on every request.
+# The tokenizer, label encoder and config are plain Python objects and can be
+# loaded in a parent process before forking (see serve.py). The Keras model can
+# not: once the TensorFlow runtime has executed ops, predictions in a forked
+# child hang, so each worker process loads its own model.
+_artifacts = {}
+_artifacts_lock = threading.Lock()
 
-    # Get predictions
-    predictions = model.predict(padded, verbose=0)[0]
-    predicted_class_idx = np.argmax(predictions)
-    predicted_category = label_encoder.inverse_transform([predicted_class_idx])[0]
-    overall_confidence = predictions[predicted_class_idx]
-
-    # Validate target category
-    available_categories = list(label_encoder.classes_)
-    if target_category not in available_categories:
-        return {
-            'error': f"Target category '{target_category}' not found. Available categories: {available_categories}"
-        }
+# Optional per-category calibrated thresholds, see Model/decision.py for the format
+ELIGIBILITY_THRESHOLDS_PATH = os.environ.get('ELIGIBILITY_THRESHOLDS', 'eligibility_thresholds.json')
+
+# Model served by default, e.g. a student from Model/distill.py. The tokenizer,
+# label encoder and config pickles are shared by all models.
+MODEL_PATH = os.environ.get('MODEL_PATH', 'final_resume_model.h5')
+
+# Layer whose output is used as the resume vector for similarity search
+EMBEDDING_LAYER = os.environ.get('EMBEDDING_LAYER', 'dense_4')
+
+MODEL_STATE = {
+    'loaded': False,
+    'warm': False,
+    'model_path': None,
+    'load_seconds': None,
+    'warmup_seconds': None
+}
+
+def load_preprocessing_artifacts():
+    """
+    Return (tokenizer, label_encoder, config), loading them on first use. Safe to call before forking.
+    """
+    artifacts = _artifacts.get('preprocessing')
+    if artifacts is not None:
+        return artifacts
+
+    with _artifacts_lock:
+        if 'preprocessing' not in _artifacts:
+            with open('tokenizer.pkl', 'rb') as f:
+                tokenizer = pickle.load(f)
+            
+            with open('label_encoder.pkl', 'rb') as f:
+                label_encoder = pickle.load(f)
+            
+            with open('model_config.pkl', 'rb') as f:
+                config = pickle.load(f)
+
+            _artifacts['preprocessing'] = (tokenizer, label_encoder, config)
+
+            # Plain Python lookups so requests never go through label_encoder.transform
+            categories = label_encoder.classes_.tolist()
+            _artifacts['categories'] = (categories, {category: i for i, category in enumerate(categories)})
+        return _artifacts['preprocessing']
 
-    # Get confidence for the target category
-    target_class_idx = label_encoder.transform([target_category])[0]
-    target_confidence = predictions[target_class_idx]
+def load_categories():
+    """
+    Return (categories, category_index): the label encoder classes as a list of
+    str and a dict mapping each category to its column in the prediction vector
+    """
+    if 'categories' not in _artifacts:
+        load_preprocessing_artifacts()
+    return _artifacts['categories']
 
-    # Determine eligibility and recommendation
-    if predicted_category == target_category:
-        is_eligible = True
-        eligibility_score = "HIGHLY SUITABLE"
-        recommendation = f"✅ RECOMMEND: Perfect match! Candidate's profile aligns well with {target_category} role."
+def load_artifacts(model_path=MODEL_PATH):
+    """
+    Return (model, tokenizer, label_encoder, config), loading them on first use
+    """
+    model = _artifacts.get(model_path)
+    if model is None:
+        with _artifacts_lock:
+            model = _artifacts.get(model_path)
+            if model is None:
+                record_cache('model', False)
+                started_at = time.perf_counter()
+                with trace_stage("model_load"):
+                    model = load_model(model_path)
+                    increment('model_loads_total')
+                _artifacts[model_path] = model
+                MODEL_STATE.update(loaded=True, model_path=model_path, load_seconds=round(time.perf_counter() - started_at, 3))
+                set_gauge('model_loaded', 1)
+            else:
+                record_cache('model', True)
     else:
-        is_eligible = False
-
-        if target_confidence >= 0.7:
-            eligibility_score = "HIGHLY SUITABLE"
-        elif target_confidence >= 0.5:
-            eligibility_score = "SUITABLE"
-        elif target_confidence >= 0.3:
-            eligibility_score = "MODERATELY SUITABLE"
-        elif target_confidence >= 0.15:
-            eligibility_score = "LESS SUITABLE"
+        record_cache('model', True)
+
+    return (model,) + load_preprocessing_artifacts()
+
+def warmup_model(model_path=MODEL_PATH):
+    """
+    Load the artifacts and run one dummy prediction so the first real request
+    does not pay for graph tracing
+    """
+    config = load_preprocessing_artifacts()[2]
+    scoring_model = load_scoring_model(model_path)
+    started_at = time.perf_counter()
+    with trace_stage("model_warmup"):
+        scoring_model.predict(np.zeros((1, config['max_length']), dtype=np.int32), verbose=0)
+    MODEL_STATE.update(warm=True, warmup_seconds=round(time.perf_counter() - started_at, 3))
+    set_gauge('model_warm', 1)
+    return MODEL_STATE
+
+def load_scoring_model(model_path=MODEL_PATH):
+    """
+    The classifier with a second output at EMBEDDING_LAYER, so a single forward
+    pass gives both the category scores and the resume vector
+    """
+    key = ('scoring', model_path)
+    scoring_model = _artifacts.get(key)
+    if scoring_model is None:
+        model = load_artifacts(model_path)[0]
+        with _artifacts_lock:
+            if key not in _artifacts:
+                _artifacts[key] = Model(inputs=model.inputs, outputs=[model.outputs[0], model.get_layer(EMBEDDING_LAYER).output])
+            scoring_model = _artifacts[key]
+    else:
+        # Requests are served from this cached sub-model, so it counts as a model cache hit
+        record_cache('model', True)
+    return scoring_model
+
+def load_decision_engine():
+    """
+    Return the EligibilityDecisionEngine for the loaded categories, with
+    per-category thresholds from ELIGIBILITY_THRESHOLDS_PATH when that file exists
+    """
+    engine = _artifacts.get('decision_engine')
+    if engine is None:
+        categories, _ = load_categories()
+        with _artifacts_lock:
+            if 'decision_engine' not in _artifacts:
+                _artifacts['decision_engine'] = EligibilityDecisionEngine.from_config(categories, ELIGIBILITY_THRESHOLDS_PATH)
+            engine = _artifacts['decision_engine']
+    return engine
+
+# Clean and preprocess text
+def clean_text(text):
+    text = re.sub(r'<.*?>', '', text)
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\S+@\S+', '', text)
+    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text.lower()
+
+def encode_texts(texts):
+    """Clean, tokenize and pad texts into the model's (batch, max_length) input"""
+    tokenizer, _, config = load_preprocessing_artifacts()
+    with trace_stage("tokenize", batch_size=len(texts)):
+        cleaned_texts = [clean_text(text) for text in texts]
+
+        # Tokenize and pad
+        sequences = tokenizer.texts_to_sequences(cleaned_texts)
+        return pad_sequences(sequences, maxlen=config['max_length'], padding='post', truncating='post')
+
+def check_eligibility_batch(resume_texts, target_categories, model_path=MODEL_PATH, top_k=3, return_embeddings=False):
+    """
+    Check eligibility of several resumes with a single model call
+
+    Args:
+        resume_texts (List[str]): Resume texts, cleaned with clean_for_ml_model
+        target_categories (List[str]): Target category for each resume
+        model_path (str): Keras model to use
+        top_k (int): Number of best matching categories returned per resume
+        return_embeddings (bool): Also return the EMBEDDING_LAYER vector as 'embedding' (float32 array)
+
+    Returns:
+        List[Dict]: One check_eligibility result per resume, {'error': ...} for unknown target categories
+    """
+    scoring_model = load_scoring_model(model_path)
+    engine = load_decision_engine()
+    categories = engine.categories
+
+    target_indices = engine.target_indices(target_categories)
+    valid_rows = np.flatnonzero(target_indices >= 0)
+
+    results = [
+        {'error': f"Target category '{target_category}' not found. Available categories: {categories}"}
+        for target_category in target_categories
+    ]
+    if valid_rows.size == 0:
+        return results
+
+    padded = encode_texts([resume_texts[i] for i in valid_rows])
+
+    # Get predictions
+    with trace_stage("predict", batch_size=int(valid_rows.size)):
+        predictions, embeddings = scoring_model.predict(padded, verbose=0)
+
+    decision = engine.decide(predictions, target_indices[valid_rows])
+    top_indices = engine.top_k(predictions, top_k).tolist()
+
+    # One conversion to native Python types per array, the dicts below hold no NumPy values
+    scores = predictions.tolist()
+    predicted_idx = decision['predicted_idx'].tolist()
+    overall_confidence = decision['overall_confidence'].tolist()
+    target_confidence = decision['target_confidence'].tolist()
+    eligible = decision['eligible'].tolist()
+    recommended = decision['recommended'].tolist()
+    levels = decision['level'].tolist()
+
+    for row, i in enumerate(valid_rows.tolist()):
+        target_category = target_categories[i]
+        predicted_category = categories[predicted_idx[row]]
+
+        # Determine recommendation
+        if eligible[row]:
+            recommendation = f"✅ RECOMMEND: Perfect match! Candidate's profile aligns well with {target_category} role."
+        elif recommended[row]:
+            recommendation = f"✅ RECOMMEND: Good fit for {target_category}, though candidate shows stronger alignment with {predicted_category}."
         else:
-            eligibility_score = "NOT SUITABLE"
-
-        recommendation = (
-            f"✅ RECOMMEND: Good fit for {target_category}, though candidate shows stronger alignment with {predicted_category}."
-            if target_confidence >= 0.5
-            else f"❌ NOT RECOMMENDED: Candidate appears better suited for {predicted_category} rather than {target_category}."
-        )
-
-    return {
-        'eligible': is_eligible,
-        'predicted_category': predicted_category,
-        'target_category': target_category,
-        'confidence_for_target': round(target_confidence, 3),
-        'overall_prediction_confidence': round(overall_confidence, 3),
-        'eligibility_score': eligibility_score,
-        'recommendation': recommendation,
-        'all_category_scores': {
-            category: round(predictions[i], 3)
-            for i, category in enumerate(label_encoder.classes_)
+            recommendation = f"❌ NOT RECOMMENDED: Candidate appears better suited for {predicted_category} rather than {target_category}."
+
+        results[i] = {
+            'eligible': eligible[row],
+            'predicted_category': predicted_category,
+            'target_category': target_category,
+            'confidence_for_target': round(target_confidence[row], 3),
+            'overall_prediction_confidence': round(overall_confidence[row], 3),
+            'eligibility_score': levels[row],
+            'recommendation': recommendation,
+            'top_categories': [
+                (categories[j], round(scores[row][j], 3))
+                for j in top_indices[row]
+            ],
+            'all_category_scores': {
+                category: round(score, 3)
+                for category, score in zip(categories, scores[row])
+            }
         }
-    }
+        if return_embeddings:
+            results[i]['embedding'] = embeddings[row].astype(np.float32, copy=False)
+
+    return results
+
+def check_eligibility(resume_text, target_category, model_path=MODEL_PATH, threshold=0.3, return_embedding=False):
+    return check_eligibility_batch([resume_text], [target_category], model_path, return_embeddings=return_embedding)[0]
+
+def load_embedding_model(model_path=MODEL_PATH):
+    """
+    Sub-model of the classifier that stops at EMBEDDING_LAYER (the last hidden
+    dense layer by default), used to turn resumes and job descriptions into vectors
+    """
+    key = ('embedding', model_path)
+    embedding_model = _artifacts.get(key)
+    if embedding_model is None:
+        model = load_artifacts(model_path)[0]
+        with _artifacts_lock:
+            if key not in _artifacts:
+                config = load_preprocessing_artifacts()[2]
+                sub_model = Model(inputs=model.inputs, outputs=model.get_layer(EMBEDDING_LAYER).output)
+                # A traced graph with a fixed signature skips predict()'s per-call setup,
+                # which dominates the latency of single-query embeddings
+                _artifacts[key] = tf.function(
+                    lambda padded: sub_model(padded, training=False),
+                    input_signature=[tf.TensorSpec([None, config['max_length']], tf.int32)]
+                )
+            embedding_model = _artifacts[key]
+    else:
+        record_cache('model', True)
+    return embedding_model
+
+def embed_texts(texts, model_path=MODEL_PATH):
+    """Return a (batch, dim) float32 array of resume vectors for the given texts"""
+    embedding_model = load_embedding_model(model_path)
+    padded = encode_texts(texts)
+    with trace_stage("embed", batch_size=len(texts)):
+        return embedding_model(tf.constant(padded, dtype=tf.int32)).numpy().astype(np.float32, copy=False)
 
 
 # 👇 Add this at the bottom of predicted.py
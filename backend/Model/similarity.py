@@ -0,0 +1,394 @@
+import argparse
+import json
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+from Model.predicted import embed_texts
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock is used
+    fcntl = None
+
+# Below this many vectors "auto" search scans everything exactly and no clustering is built
+APPROX_MIN_VECTORS = int(os.environ.get('APPROX_MIN_VECTORS', 50000))
+# The clustering is rebuilt in the background once the index has grown by this factor since the last build
+APPROX_REBUILD_GROWTH = float(os.environ.get('APPROX_REBUILD_GROWTH', 1.5))
+
+SEARCH_MODES = ('auto', 'exact', 'approx')
+
+# Where analysed resumes are stored for matching, empty to disable storing
+RESUME_INDEX_DIR = os.environ.get('RESUME_INDEX_DIR', 'resume_index')
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class ResumeVectorIndex:
+    """
+    Memory-mapped store of L2-normalised resume vectors with top-k cosine search.
+
+    Layout of index_dir:
+        meta.json    dim, count and capacity of the vector file
+        vectors.f32  float32 matrix (capacity x dim), memory-mapped, grown by doubling
+        ids.jsonl    one {"id": ..., "metadata": {...}} line per stored vector
+        ivf.npz      optional coarse clustering for approximate search
+
+    Search is exact (one matrix-vector product) for small sets. In "approx"
+    mode only the vectors in the nprobe closest clusters are scored, plus any
+    vectors added after the clustering was built. The clustering is built
+    automatically (in a background thread) once the index holds
+    APPROX_MIN_VECTORS vectors and rebuilt as it grows, or on demand with
+    `python -m Model.similarity build`.
+    """
+
+    def __init__(self, index_dir, dim):
+        self.index_dir = index_dir
+        self.dim = dim
+        os.makedirs(index_dir, exist_ok=True)
+
+        self._meta_path = os.path.join(index_dir, 'meta.json')
+        self._vectors_path = os.path.join(index_dir, 'vectors.f32')
+        self._ids_path = os.path.join(index_dir, 'ids.jsonl')
+        self._ivf_path = os.path.join(index_dir, 'ivf.npz')
+        self._lock_path = os.path.join(index_dir, '.lock')
+        self._build_lock_path = os.path.join(index_dir, '.ivf.lock')
+
+        self._lock = threading.RLock()
+        self._build_thread_lock = threading.Lock()
+        self._rebuild_scheduled = False
+        self._meta_version = None
+        self._ivf_mtime = None
+        self._ivf = None
+        self.count = 0
+        self.capacity = 0
+        self.ids = []
+        self.metadata = []
+        self._row_by_id = {}
+        self._vectors = None
+
+        if not os.path.exists(self._meta_path):
+            self._write_meta()
+        self._refresh()
+
+    def __len__(self):
+        self._refresh()
+        return self.count
+
+    # Storage
+
+    @contextmanager
+    def _file_lock(self, lock_path=None, thread_lock=None):
+        """
+        Exclusive lock across worker processes sharing the same index_dir. Writes
+        use the default lock, clustering builds a separate one so adds are not
+        blocked while a build runs.
+        """
+        with thread_lock or self._lock, open(lock_path or self._lock_path, 'a') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _write_meta(self):
+        tmp_path = self._meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'dim': self.dim, 'count': self.count, 'capacity': self.capacity}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _map_vectors(self):
+        if self.capacity == 0:
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        else:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r+', shape=(self.capacity, self.dim))
+
+    def _refresh(self):
+        """Pick up vectors written by other processes since the last call"""
+        # meta.json is replaced atomically on every write, so a new inode means new data
+        stat = os.stat(self._meta_path)
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self._meta_version:
+            return
+        with self._lock:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            if meta['dim'] != self.dim:
+                raise ValueError(f"Index at {self.index_dir} holds {meta['dim']}-d vectors, model produces {self.dim}-d")
+
+            if meta['capacity'] != self.capacity or self._vectors is None:
+                self.capacity = meta['capacity']
+                self._map_vectors()
+
+            if meta['count'] > len(self.ids):
+                # Lines past meta['count'] may still be half written by another worker
+                with open(self._ids_path) as f:
+                    for line_number, line in enumerate(f):
+                        if line_number >= meta['count']:
+                            break
+                        if line_number >= len(self.ids):
+                            entry = json.loads(line)
+                            self._row_by_id[entry['id']] = len(self.ids)
+                            self.ids.append(entry['id'])
+                            self.metadata.append(entry.get('metadata', {}))
+            self.count = meta['count']
+            self._meta_version = version
+
+    def add(self, ids, vectors, metadata=None):
+        """
+        Append a batch of vectors
+
+        Args:
+            ids (List[str]): One id per vector
+            vectors (np.ndarray): (batch, dim) vectors, normalised here
+            metadata (List[Dict]): Optional JSON-serialisable metadata per vector
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+        metadata = metadata or [{} for _ in ids]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        with self._file_lock():
+            self._meta_version = None
+            self._refresh()
+
+            needed = self.count + len(vectors)
+            if needed > self.capacity:
+                new_capacity = max(1024, self.capacity)
+                while new_capacity < needed:
+                    new_capacity *= 2
+                if self._vectors is not None and isinstance(self._vectors, np.memmap):
+                    self._vectors.flush()
+                with open(self._vectors_path, 'ab') as f:
+                    f.truncate(new_capacity * self.dim * 4)
+                self.capacity = new_capacity
+                self._map_vectors()
+
+            self._vectors[self.count:needed] = vectors
+            self._vectors.flush()
+            with open(self._ids_path, 'a') as f:
+                for resume_id, meta in zip(ids, metadata):
+                    f.write(json.dumps({'id': resume_id, 'metadata': meta}) + '\n')
+
+            for resume_id in ids:
+                self._row_by_id[resume_id] = len(self.ids)
+                self.ids.append(resume_id)
+            self.metadata.extend(metadata)
+            self.count = needed
+            self._write_meta()
+            stat = os.stat(self._meta_path)
+            self._meta_version = (stat.st_ino, stat.st_mtime_ns)
+
+        if self._approx_index_stale():
+            self._schedule_rebuild()
+
+    def get_vector(self, resume_id):
+        """Stored (normalised) vector for an id, or None"""
+        self._refresh()
+        row = self._row_by_id.get(resume_id)
+        return None if row is None else np.array(self._vectors[row])
+
+    # Approximate search
+
+    def _approx_index_stale(self):
+        """True when the index is large enough for approximate search and the clustering is missing or outgrown"""
+        if self.count < APPROX_MIN_VECTORS:
+            return False
+        ivf = self._load_ivf()
+        return ivf is None or self.count >= int(ivf['indexed_count']) * APPROX_REBUILD_GROWTH
+
+    def _schedule_rebuild(self):
+        with self._lock:
+            if self._rebuild_scheduled:
+                return
+            self._rebuild_scheduled = True
+        threading.Thread(target=self._rebuild_if_stale, daemon=True).start()
+
+    def _rebuild_if_stale(self):
+        try:
+            with self._file_lock(self._build_lock_path, self._build_thread_lock):
+                # Another worker may have rebuilt it while this one waited for the lock
+                self._ivf_mtime = None
+                if self._approx_index_stale():
+                    print(f"Rebuilding approximate index for {self.count} resumes in {self.index_dir}")
+                    self._build_approx_index()
+        except Exception as e:
+            print(f"Approximate index rebuild failed: {str(e)}")
+        finally:
+            self._rebuild_scheduled = False
+
+    def build_approx_index(self, n_lists=None, iterations=10, sample_size=50000, seed=42):
+        """
+        Cluster the stored vectors with spherical k-means so approximate search
+        only has to score a few clusters. Returns the number of clusters.
+        """
+        with self._file_lock(self._build_lock_path, self._build_thread_lock):
+            return self._build_approx_index(n_lists, iterations, sample_size, seed)
+
+    def _build_approx_index(self, n_lists=None, iterations=10, sample_size=50000, seed=42):
+        self._refresh()
+        count = self.count
+        if count == 0:
+            return None
+        vectors = self._vectors[:count]
+        n_lists = n_lists or max(1, int(np.sqrt(count)))
+
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(count, size=min(sample_size, count), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=min(n_lists, len(sample)), replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        # Assign every stored vector in chunks to bound memory
+        assignment = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 65536):
+            assignment[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind='stable').astype(np.int64)
+        offsets = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+
+        tmp_path = self._ivf_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, centroids=centroids, order=order, offsets=offsets, indexed_count=count)
+        os.replace(tmp_path, self._ivf_path)
+        self._ivf_mtime = None
+        return len(centroids)
+
+    def _load_ivf(self):
+        if not os.path.exists(self._ivf_path):
+            return None
+        mtime = os.path.getmtime(self._ivf_path)
+        if mtime != self._ivf_mtime:
+            with np.load(self._ivf_path) as data:
+                self._ivf = {key: data[key] for key in data.files}
+            self._ivf_mtime = mtime
+        return self._ivf
+
+    # Search
+
+    def search(self, queries, k=10, mode='auto', nprobe=8):
+        """
+        Top-k cosine search
+
+        Args:
+            queries (np.ndarray): (dim,) or (batch, dim) query vectors
+            k (int): Number of results per query
+            mode (str): "exact", "approx" or "auto" (approx only for large indexes with clustering built)
+            nprobe (int): Clusters scored per query in approx mode
+
+        Returns:
+            List[List[Dict]]: Per query, up to k {"id", "score", "metadata"} dicts, best first
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of {', '.join(SEARCH_MODES)}")
+        self._refresh()
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        count = self.count
+        if count == 0:
+            return [[] for _ in queries]
+
+        ivf = self._load_ivf() if mode != 'exact' else None
+        use_approx = ivf is not None and (mode == 'approx' or (mode == 'auto' and count >= APPROX_MIN_VECTORS))
+
+        vectors = self._vectors[:count]
+        results = []
+        for query in queries:
+            if use_approx:
+                candidates = self._approx_candidates(query, ivf, count, nprobe)
+                scores = vectors[candidates] @ query
+            else:
+                candidates = None
+                scores = vectors @ query
+
+            top_k = min(k, len(scores))
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            top = top[np.argsort(-scores[top])]
+            rows = candidates[top] if candidates is not None else top
+            results.append([
+                {'id': self.ids[row], 'score': round(score, 4), 'metadata': self.metadata[row]}
+                for row, score in zip(rows.tolist(), scores[top].tolist())
+            ])
+        return results
+
+    def _approx_candidates(self, query, ivf, count, nprobe):
+        centroid_scores = ivf['centroids'] @ query
+        nprobe = min(nprobe, len(centroid_scores))
+        probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        offsets, order = ivf['offsets'], ivf['order']
+        parts = [order[offsets[c]:offsets[c + 1]] for c in probed]
+        # Vectors added after the clustering was built are always scored
+        indexed_count = int(ivf['indexed_count'])
+        if count > indexed_count:
+            parts.append(np.arange(indexed_count, count))
+        return np.concatenate(parts)
+
+
+def get_resume_index():
+    """Process-wide ResumeVectorIndex in RESUME_INDEX_DIR, sized to the embedding layer"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                dim = embed_texts([""]).shape[1]
+                _index = ResumeVectorIndex(RESUME_INDEX_DIR, dim)
+    return _index
+
+def index_resumes(resume_ids, resume_texts, metadata=None, vectors=None):
+    """
+    Store resumes for similarity search. Pass vectors when they are already known
+    (check_eligibility(..., return_embedding=True)) to skip embedding the texts again.
+    """
+    if not RESUME_INDEX_DIR:
+        return False
+    if vectors is None:
+        vectors = embed_texts(resume_texts)
+    get_resume_index().add(resume_ids, vectors, metadata)
+    return True
+
+def match_text(text, top_k=10, mode='auto', nprobe=8):
+    """Stored resumes closest to a job description (or any resume-like text)"""
+    return get_resume_index().search(embed_texts([text]), k=top_k, mode=mode, nprobe=nprobe)[0]
+
+def similar_resumes(resume_id, top_k=10, mode='auto', nprobe=8):
+    """Stored resumes closest to an already stored one, or None if the id is unknown"""
+    index = get_resume_index()
+    vector = index.get_vector(resume_id)
+    if vector is None:
+        return None
+    matches = index.search(vector, k=top_k + 1, mode=mode, nprobe=nprobe)[0]
+    return [match for match in matches if match['id'] != resume_id][:top_k]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the resume vector index")
+    parser.add_argument('command', choices=['build', 'stats'], help="build: (re)build the approximate search clustering")
+    parser.add_argument('--index-dir', default=RESUME_INDEX_DIR or 'resume_index')
+    parser.add_argument('--n-lists', type=int, help="Number of clusters, sqrt(count) by default")
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    with open(os.path.join(args.index_dir, 'meta.json')) as f:
+        index = ResumeVectorIndex(args.index_dir, json.load(f)['dim'])
+
+    if args.command == 'build':
+        n_lists = index.build_approx_index(n_lists=args.n_lists, iterations=args.iterations)
+        print(f"Built {n_lists} clusters over {len(index)} resumes in {args.index_dir}")
+    else:
+        ivf = index._load_ivf()
+        print(json.dumps({
+            'count': len(index),
+            'dim': index.dim,
+            'approx_clusters': None if ivf is None else len(ivf['centroids']),
+            'approx_indexed_count': None if ivf is None else int(ivf['indexed_count'])
+        }, indent=2))
@@ -9,6 +9,35 @@ import pickle
 
 
 
+def clean_text(text):
+    
+    if pd.isna(text):
+        return ""
+    
+    # Remove HTML tags
+    text = re.sub(r'<.*?>', '', text)
+    
+    # Remove URLs
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    
+    # Remove email addresses
+    text = re.sub(r'\S+@\S+', '', text)
+    
+    # Remove phone numbers
+    text = re.sub(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b', '', text)
+    
+    # Remove special characters but keep spaces
+    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    
+    # Remove extra whitespaces
+    text = re.sub(r'\s+', ' ', text).strip()
+    
+    # Convert to lowercase
+    text = text.lower()
+    
+    return text
+
+
 def text_preprocessing(csv_file_path):
    
     print("Loading dataset...")
@@ -17,34 +46,6 @@ def text_preprocessing(csv_file_path):
     print("\nClass distribution:")
     print(df['Category'].value_counts())
     
-    def clean_text(text):
-        
-        if pd.isna(text):
-            return ""
-        
-        # Remove HTML tags
-        text = re.sub(r'<.*?>', '', text)
-        
-        # Remove URLs
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-        
-        # Remove email addresses
-        text = re.sub(r'\S+@\S+', '', text)
-        
-        # Remove phone numbers
-        text = re.sub(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b', '', text)
-        
-        # Remove special characters but keep spaces
-        text = re.sub(r'[^a-zA-Z\s]', '', text)
-        
-        # Remove extra whitespaces
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        # Convert to lowercase
-        text = text.lower()
-        
-        return text
-    
     print("\n🔹 Cleaning text data...")
     df['cleaned_resume'] = df['Resume'].apply(clean_text)
     
@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+# Default time budget of an /image-capture request, clients can lower it with X-Request-Deadline-Ms
+REQUEST_TIMEOUT_MS = float(os.environ.get('REQUEST_TIMEOUT_MS', 60000))
+# How long a request may queue for an LLM slot before it is degraded to eligibility only
+LLM_QUEUE_WAIT_MS = float(os.environ.get('LLM_QUEUE_WAIT_MS', 2000))
+# Remaining budget assumed necessary for the feedback calls until real timings are available
+LLM_MIN_BUDGET_MS = float(os.environ.get('LLM_MIN_BUDGET_MS', 15000))
+
+
+class Overloaded(Exception):
+    """The stage queue is full, the request is shed"""
+
+    def __init__(self, stage):
+        super().__init__(f"Server overloaded at stage '{stage}', please retry shortly")
+        self.stage = stage
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before the stage could start or finish"""
+
+    def __init__(self, stage):
+        super().__init__(f"Request deadline exceeded at stage '{stage}'")
+        self.stage = stage
+
+
+class StageLimiter:
+    """
+    Concurrency limit for one pipeline stage with a bounded wait queue.
+    Requests beyond max_concurrent wait (at most max_queue of them) until a slot
+    frees up or their deadline passes.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge('stage_active', self.active, stage=self.name)
+        metrics.set_gauge('stage_queue_depth', self.waiting, stage=self.name)
+
+    def _shed(self, reason):
+        metrics.increment('shed_total', stage=self.name, reason=reason)
+
+    def acquire(self, deadline=None):
+        """Take a slot, waiting until the deadline (time.monotonic() value) at most"""
+        with self._cond:
+            if deadline is not None and time.monotonic() >= deadline:
+                self._shed('deadline')
+                raise DeadlineExceeded(self.name)
+
+            if self.active < self.max_concurrent and self.waiting == 0:
+                self.active += 1
+                self._publish()
+                return
+
+            if self.waiting >= self.max_queue:
+                self._shed('queue_full')
+                raise Overloaded(self.name)
+
+            self.waiting += 1
+            self._publish()
+            queued_at = time.perf_counter()
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._shed('deadline')
+                        raise DeadlineExceeded(self.name)
+                    self._cond.wait(remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+                self._publish()
+                metrics.observe(f'queue:{self.name}', time.perf_counter() - queued_at)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._publish()
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self, deadline=None):
+        self.acquire(deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def _limiter(stage, concurrent, queue):
+    return StageLimiter(
+        stage,
+        int(os.environ.get(f'LIMIT_{stage.upper()}_CONCURRENCY', concurrent)),
+        int(os.environ.get(f'LIMIT_{stage.upper()}_QUEUE', queue))
+    )
+
+
+# Per worker process. OCR and LLM stages mostly wait on Groq, the model stage is CPU bound.
+LIMITERS = {
+    'ocr': _limiter('ocr', 8, 16),
+    'model': _limiter('model', 2, 32),
+    'llm': _limiter('llm', 8, 8),
+}
+
+
+def request_deadline(header_value=None, body_value=None):
+    """Absolute time.monotonic() deadline from the client's budget in ms, capped at REQUEST_TIMEOUT_MS"""
+    budget_ms = REQUEST_TIMEOUT_MS
+    for value in (header_value, body_value):
+        if value is not None:
+            try:
+                budget_ms = min(budget_ms, float(value))
+            except (TypeError, ValueError):
+                pass
+    return time.monotonic() + budget_ms / 1000
+
+
+def remaining_ms(deadline):
+    return (deadline - time.monotonic()) * 1000
+
+
+def client_options(deadline, stage):
+    """
+    timeout / max_retries for an outbound API client so the call ends by the
+    deadline. A retry would start again with the full timeout, so there are none.
+    """
+    if deadline is None:
+        return {}
+    seconds = remaining_ms(deadline) / 1000
+    if seconds <= 0:
+        metrics.increment('shed_total', stage=stage, reason='deadline')
+        raise DeadlineExceeded(stage)
+    return {'timeout': seconds, 'max_retries': 0}
+
+
+def expected_llm_ms(combined):
+    """p50 of the feedback stage(s) seen so far, LLM_MIN_BUDGET_MS before any were measured"""
+    stages = ['combined_feedback'] if combined else ['feedback', 'detailed_analysis']
+    total = 0.0
+    for stage in stages:
+        observed = metrics.percentiles(f'stage:{stage}')
+        if not observed:
+            return LLM_MIN_BUDGET_MS
+        total += observed['p50'] * 1000
+    return total
+
+
+def admit_llm(deadline, combined):
+    """
+    Decide whether a request still gets LLM feedback. Returns None once an LLM
+    slot is held (the caller releases LIMITERS['llm']), otherwise the reason
+    the request is degraded to eligibility only.
+    """
+    if remaining_ms(deadline) < expected_llm_ms(combined):
+        reason = 'budget'
+    else:
+        wait_until = min(deadline, time.monotonic() + LLM_QUEUE_WAIT_MS / 1000)
+        try:
+            LIMITERS['llm'].acquire(wait_until)
+            return None
+        except Overloaded:
+            reason = 'llm_queue_full'
+        except DeadlineExceeded:
+            reason = 'llm_queue_timeout'
+    metrics.increment('degraded_total', reason=reason)
+    return reason
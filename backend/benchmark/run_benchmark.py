@@ -0,0 +1,330 @@
+"""
+Offline benchmark and load test for the resume pipeline.
+
+Covers clean_for_ml_model, tokenization, check_eligibility (cold and warm) and
+the full /image-capture route. The route is driven at a fixed request rate
+against a local stub Groq server, so no API key or network access is needed.
+Results are written as JSON so runs can be compared over time.
+
+Run from the backend directory:
+
+    python -m benchmark.run_benchmark --rps 5 --duration 30 --latency-ms 400 --output bench.json
+"""
+import argparse
+import base64
+import datetime
+import io
+import json
+import os
+import pickle
+import mimetypes
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmark.stub_groq import StubGroqServer
+
+BENCHMARKS = ['clean', 'tokenize', 'eligibility', 'route']
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def rss_mb():
+    """Current and peak resident set size of this process"""
+    current = None
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        pass
+    peak = None
+    try:
+        import resource  # Not available on Windows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / 2**20 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KiB elsewhere
+    except ImportError:
+        pass
+    return {"rss_mb": round(current, 1) if current else None, "peak_rss_mb": round(peak, 1) if peak else None}
+
+
+def load_corpus(csv_path, limit):
+    import pandas as pd
+    df = pd.read_csv(csv_path).dropna(subset=['Resume', 'Category'])
+    df = df.sample(n=min(limit, len(df)), random_state=42)
+    return df['Resume'].tolist(), df['Category'].tolist()
+
+
+def render_fixture_image(text, width=850, height=1100):
+    """Draw resume text onto a white page and return it as a base64 PNG data URL"""
+    from PIL import Image, ImageDraw
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    words, line, y = text.split(), '', 40
+    for word in words:
+        if len(line) + len(word) > 100:
+            draw.text((40, y), line, fill='black')
+            line, y = '', y + 16
+            if y > height - 40:
+                break
+        line += word + ' '
+    draw.text((40, y), line, fill='black')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def load_fixture_images(images_dir, texts):
+    """Use the images in images_dir if given, otherwise render one page per corpus resume"""
+    if images_dir:
+        images = []
+        for name in sorted(os.listdir(images_dir)):
+            if name.lower().endswith(('.png', '.jpg', '.jpeg')):
+                mime_type = mimetypes.guess_type(name)[0] or 'image/png'
+                with open(os.path.join(images_dir, name), 'rb') as f:
+                    images.append(f"data:{mime_type};base64," + base64.b64encode(f.read()).decode())
+        return images
+    return [render_fixture_image(text) for text in texts]
+
+
+def bench_clean(texts, iterations):
+    from LLM.text_extraction import clean_for_ml_model
+    durations = []
+    for _ in range(iterations):
+        for text in texts:
+            started_at = time.perf_counter()
+            clean_for_ml_model(text)
+            durations.append(time.perf_counter() - started_at)
+    result = summarize(durations)
+    result["throughput_per_s"] = round(len(durations) / sum(durations), 1)
+    return result
+
+
+def bench_tokenize(texts, iterations):
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+    with open('tokenizer.pkl', 'rb') as f:
+        tokenizer = pickle.load(f)
+    with open('model_config.pkl', 'rb') as f:
+        config = pickle.load(f)
+
+    durations = []
+    for _ in range(iterations):
+        for text in texts:
+            started_at = time.perf_counter()
+            sequence = tokenizer.texts_to_sequences([text])
+            pad_sequences(sequence, maxlen=config['max_length'], padding='post', truncating='post')
+            durations.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    pad_sequences(tokenizer.texts_to_sequences(texts), maxlen=config['max_length'], padding='post', truncating='post')
+    batch_duration = time.perf_counter() - started_at
+
+    result = summarize(durations)
+    result["throughput_per_s"] = round(len(durations) / sum(durations), 1)
+    result["batch_throughput_per_s"] = round(len(texts) / batch_duration, 1)
+    return result
+
+
+def bench_check_eligibility(texts, categories, warm_iterations):
+    from LLM.text_extraction import clean_for_ml_model
+    from Model.predicted import check_eligibility
+
+    cleaned = [clean_for_ml_model(text) for text in texts]
+
+    started_at = time.perf_counter()
+    check_eligibility(cleaned[0], categories[0])
+    cold = time.perf_counter() - started_at
+    rss_after_cold = rss_mb()
+
+    durations = []
+    for i in range(warm_iterations):
+        started_at = time.perf_counter()
+        check_eligibility(cleaned[i % len(cleaned)], categories[i % len(categories)])
+        durations.append(time.perf_counter() - started_at)
+
+    return {
+        "cold_ms": round(cold * 1000, 3),
+        "warm": summarize(durations),
+        "memory_after_cold": rss_after_cold,
+    }
+
+
+def bench_route(images, categories, rps, duration, concurrency, mode, unique_requests=True):
+    """
+    Open-loop load at a fixed request rate against a real HTTP server running the Flask app.
+    With unique_requests every request sends its own Idempotency-Key, so repeated fixtures
+    are not collapsed by single-flight or served from the result store.
+    """
+    import requests
+    from werkzeug.serving import make_server
+    from routes import app
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/image-capture"
+
+    session_local = threading.local()
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def fire(index, scheduled_at):
+        if not hasattr(session_local, 'session'):
+            session_local.session = requests.Session()
+        payload = {'image': images[index % len(images)], 'category': categories[index % len(categories)], 'mode': mode}
+        headers = {'Idempotency-Key': f'bench-{index}'} if unique_requests else {}
+        try:
+            status = session_local.session.post(url, json=payload, headers=headers, timeout=120).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        # Latency is measured from the scheduled send time so queueing delay is not hidden
+        latency = time.perf_counter() - scheduled_at
+        with lock:
+            latencies.append(latency)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    total_requests = int(rps * duration)
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i in range(total_requests):
+            scheduled_at = started_at + i / rps
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(fire, i, scheduled_at)
+    elapsed = time.perf_counter() - started_at
+    server.shutdown()
+
+    result = summarize(latencies)
+    result.update({
+        "target_rps": rps,
+        "achieved_rps": round(len(latencies) / elapsed, 2),
+        "statuses": statuses,
+        "mode": mode,
+        "llm": llm_usage(mode),
+        "memory": rss_mb(),
+    })
+    return result
+
+
+def llm_usage(mode):
+    """Per request LLM calls, tokens and time for the feedback mode, from the metrics the route recorded"""
+    import metrics
+
+    requests_done = metrics.counter_value('llm_requests_total', mode=mode)
+    if not requests_done:
+        return {"requests": 0}
+    usage = {"requests": int(requests_done)}
+    usage["calls_per_request"] = round(metrics.counter_value('llm_calls_total', mode=mode) / requests_done, 3)
+    for kind in ('prompt', 'completion'):
+        usage[f"{kind}_tokens_per_request"] = round(metrics.counter_value('llm_tokens_total', mode=mode, kind=kind) / requests_done, 1)
+    usage["fallbacks"] = int(metrics.counter_value('llm_fallback_total', mode=mode))
+    for quantile, value in metrics.percentiles(f'stage:llm_call:{mode}').items():
+        usage[f"llm_{quantile}_ms"] = round(value * 1000, 3)
+    return usage
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark and load test for the resume pipeline")
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--artifacts-dir', default=REPO_DIR, help="Directory holding tokenizer.pkl, label_encoder.pkl, model_config.pkl and the model")
+    parser.add_argument('--csv', default=os.path.join(BACKEND_DIR, 'Model', 'gpt_dataset.csv'))
+    parser.add_argument('--images', help="Directory of resume images to replay instead of rendered fixtures")
+    parser.add_argument('--corpus-size', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=5, help="Passes over the corpus for the text benchmarks")
+    parser.add_argument('--warm-iterations', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=300.0, help="Artificial latency of each stub Groq completion")
+    parser.add_argument('--jitter-ms', type=float, default=50.0)
+    parser.add_argument('--rps', type=float, default=2.0)
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds of load for the route benchmark")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--mode', default='two_call', choices=['two_call', 'combined'])
+    parser.add_argument('--result-store', default='none', choices=['none', 'memory', 'sqlite'],
+                        help="Result store used by the route, 'none' so every request runs the pipeline")
+    parser.add_argument('--resume-index-dir', default='',
+                        help="Resume vector index used by the route, empty to skip indexing")
+    parser.add_argument('--output', help="Write JSON results to this file (stdout otherwise)")
+    args = parser.parse_args()
+
+    texts, categories = load_corpus(args.csv, args.corpus_size)
+    os.chdir(args.artifacts_dir)
+
+    stub = StubGroqServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, ocr_corpus=texts).start()
+    os.environ['GROQ_BASE_URL'] = stub.base_url
+    os.environ.setdefault('TRACE_LOG', '0')
+    # Read by routes at import: by default the route benchmark measures the pipeline,
+    # not stored results, and writes nothing into the artifacts directory
+    os.environ['RESULT_STORE'] = args.result_store
+    os.environ['RESUME_INDEX_DIR'] = args.resume_index_dir
+
+    results = {
+        "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "benchmarks": {},
+    }
+
+    for name in args.only:
+        print(f"Running {name} benchmark...", file=sys.stderr)
+        try:
+            if name == 'clean':
+                results["benchmarks"][name] = bench_clean(texts, args.iterations)
+            elif name == 'tokenize':
+                results["benchmarks"][name] = bench_tokenize(texts, args.iterations)
+            elif name == 'eligibility':
+                results["benchmarks"][name] = bench_check_eligibility(texts, categories, args.warm_iterations)
+            elif name == 'route':
+                images = load_fixture_images(args.images, texts)
+                results["benchmarks"][name] = bench_route(
+                    images, categories, args.rps, args.duration, args.concurrency, args.mode,
+                    unique_requests=args.result_store == 'none'
+                )
+                results["benchmarks"][name]["stub_requests"] = stub.request_count
+        except Exception as e:
+            print(f"{name} benchmark failed: {str(e)}", file=sys.stderr)
+            results["benchmarks"][name] = {"error": str(e)}
+
+    stub.stop()
+    results["memory"] = rss_mb()
+
+    output = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Local stand-in for the Groq chat completions API used by the benchmarks.
+
+The Groq SDK reads GROQ_BASE_URL, so pointing it at this server replays the
+whole pipeline offline. Every completion sleeps for a configurable artificial
+latency to mimic the real round trip.
+
+    python -m benchmark.stub_groq --port 8765 --latency-ms 400
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_OCR_TEXT = """
+Senior Frontend Developer with 5 years of experience building responsive web applications.
+Skills: JavaScript, TypeScript, React, Redux, HTML, CSS, TailwindCSS, Jest, Git, REST, GraphQL.
+Led migration of a legacy jQuery dashboard to React, improving load time by 40%.
+Built a component library used across 6 product teams and mentored 3 junior developers.
+"""
+
+FEEDBACK_TEXT = (
+    "Your resume shows solid hands-on experience and a clear focus on modern tooling. "
+    "Quantify more of your achievements and bring the most relevant projects to the top."
+)
+
+DETAILED_TEXT = """1. STRENGTHS: Strong technical skill set.
+2. WEAKNESSES: Few measurable results.
+3. MISSING ELEMENTS: Testing and deployment experience.
+4. SPECIFIC RECOMMENDATIONS: Add metrics to each role.
+5. KEYWORD SUGGESTIONS: CI/CD, accessibility, performance.
+6. FORMATTING TIPS: Keep it to one page."""
+
+COMBINED_JSON = {
+    "feedback": FEEDBACK_TEXT,
+    "detailed_analysis": {
+        "strengths": ["Strong technical skill set"],
+        "weaknesses": ["Few measurable results"],
+        "missing_elements": ["Testing and deployment experience"],
+        "specific_recommendations": ["Add metrics to each role"],
+        "keyword_suggestions": ["CI/CD", "accessibility", "performance"],
+        "formatting_tips": ["Keep it to one page"]
+    }
+}
+
+
+class StubGroqServer:
+    """Threaded HTTP server answering /openai/v1/chat/completions with canned content"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, ocr_corpus=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ocr_corpus = ocr_corpus or [DEFAULT_OCR_TEXT]
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _content_for(self, body):
+        messages = body.get('messages', [])
+        last = messages[-1]['content'] if messages else ''
+
+        if isinstance(last, list):
+            # Vision request: pick a corpus entry from the image payload so the same image
+            # always "extracts" to the same text
+            image_url = next((part['image_url']['url'] for part in last if part.get('type') == 'image_url'), '')
+            digest = int(hashlib.md5(image_url.encode()).hexdigest(), 16)
+            return self.ocr_corpus[digest % len(self.ocr_corpus)]
+
+        if (body.get('response_format') or {}).get('type') == 'json_object':
+            return json.dumps(COMBINED_JSON)
+
+        if 'Provide detailed analysis' in last:
+            return DETAILED_TEXT
+
+        return FEEDBACK_TEXT
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+
+                with stub._count_lock:
+                    stub.request_count += 1
+
+                delay = stub.latency_ms + random.uniform(-stub.jitter_ms, stub.jitter_ms)
+                if delay > 0:
+                    time.sleep(delay / 1000)
+
+                content = stub._content_for(body)
+                prompt_tokens = len(json.dumps(body.get('messages', []))) // 4
+                completion_tokens = len(content) // 4
+                payload = json.dumps({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get('model', 'stub'),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens
+                    }
+                }).encode()
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the stub Groq API server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubGroqServer(args.host, args.port, args.latency_ms, args.jitter_ms)
+    print(f"Stub Groq server listening on {server.base_url} (export GROQ_BASE_URL={server.base_url})")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,53 @@
+from flask.json.provider import DefaultJSONProvider
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes NumPy types natively, so responses do not
+    need a recursive convert pass. Uses orjson when it is installed and falls
+    back to the standard library encoder otherwise.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, np.generic):
+            return o.item()
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        # jsonify always passes compact separators or indent=2 (debug), both map to orjson.
+        # Any other kwargs go to the stdlib encoder.
+        option = self._orjson_option(kwargs)
+        if option is not None:
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+        return super().dumps(obj, **kwargs)
+
+    def _orjson_option(self, kwargs):
+        """orjson option flags equivalent to the json.dumps kwargs, or None when orjson can not honour them"""
+        if orjson is None:
+            return None
+        kwargs = dict(kwargs)
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if tuple(kwargs.pop('separators', None) or (',', ':')) != (',', ':'):
+            return None
+        indent = kwargs.pop('indent', None)
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        elif indent is not None:
+            return None
+        return None if kwargs else option
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
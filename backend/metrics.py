@@ -0,0 +1,234 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import numpy as np
+
+# Number of most recent samples kept per histogram, percentiles are computed over this window
+HISTOGRAM_WINDOW = int(os.environ.get('METRICS_HISTOGRAM_WINDOW', 2048))
+
+# Print one JSON line per finished span (set TRACE_LOG=0 to silence)
+TRACE_LOG = os.environ.get('TRACE_LOG', '1') != '0'
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+# Innermost open OpenTelemetry span (request or stage), the parent of the next one started
+_otel_span = contextvars.ContextVar('otel_span', default=None)
+_lock = threading.Lock()
+_histograms = defaultdict(lambda: deque(maxlen=HISTOGRAM_WINDOW))
+_histogram_totals = defaultdict(lambda: [0, 0.0])  # name -> [count, sum]
+_counters = defaultdict(float)
+_gauges = {}
+
+
+def _init_otel_tracer():
+    """
+    Optional OpenTelemetry exporter, enabled by pointing OTEL_EXPORTER_OTLP_ENDPOINT
+    at a collector (e.g. http://localhost:4318). Returns None when disabled or when
+    the opentelemetry packages are not installed.
+    """
+    endpoint = os.environ.get('OTEL_EXPORTER_OTLP_ENDPOINT')
+    if not endpoint:
+        return None
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        print("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry is not installed, tracing export disabled")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": os.environ.get('OTEL_SERVICE_NAME', 'resume-detector')}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=f"{endpoint.rstrip('/')}/v1/traces")))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer("resume-detector")
+
+
+_otel_tracer = _init_otel_tracer()
+
+
+def new_request_id(request_id: Optional[str] = None) -> str:
+    """Set the request id for the current context, generating one if not given"""
+    request_id = request_id or uuid.uuid4().hex
+    _request_id.set(request_id)
+    return request_id
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def _start_otel_span(name: str, attributes: dict):
+    from opentelemetry import trace
+
+    parent = _otel_span.get()
+    context = trace.set_span_in_context(parent) if parent is not None else None
+    return _otel_tracer.start_span(name, context=context, attributes={"request_id": current_request_id() or "", **attributes})
+
+
+def start_request_span(name: str, **attributes):
+    """
+    Open the root span of a request when OpenTelemetry is configured. Stage spans
+    started in this context become its children. Returns a handle for end_request_span.
+    """
+    if _otel_tracer is None:
+        return None
+    span = _start_otel_span(name, attributes)
+    return span, _otel_span.set(span)
+
+
+def end_request_span(handle, status_code: Optional[int] = None):
+    if handle is None:
+        return
+    span, token = handle
+    if status_code is not None:
+        span.set_attribute("http.status_code", status_code)
+    span.end()
+    _otel_span.reset(token)
+
+
+def observe(name: str, value: float):
+    """Record one sample (seconds) in the named histogram"""
+    with _lock:
+        _histograms[name].append(value)
+        totals = _histogram_totals[name]
+        totals[0] += 1
+        totals[1] += value
+
+
+def increment(name: str, amount: float = 1, **labels):
+    """Increase a counter, labels become Prometheus labels"""
+    with _lock:
+        _counters[(name, tuple(sorted(labels.items())))] += amount
+
+
+def set_gauge(name: str, value: float, **labels):
+    with _lock:
+        _gauges[(name, tuple(sorted(labels.items())))] = value
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup so /metrics can report hit rates"""
+    increment('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+@contextmanager
+def trace_stage(stage: str, **attributes):
+    """
+    Time a pipeline stage. The duration goes into the `stage_duration_seconds`
+    histogram for that stage, a JSON trace line is printed with the request id,
+    and a span is exported when OpenTelemetry is configured.
+    """
+    request_id = current_request_id()
+    otel_span = None
+    if _otel_tracer is not None:
+        # Child of the request (or enclosing stage) span, and parent of nested stages
+        otel_span = _start_otel_span(stage, attributes)
+        otel_token = _otel_span.set(otel_span)
+
+    started_at = time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except Exception:
+        status = 'error'
+        raise
+    finally:
+        duration = time.perf_counter() - started_at
+        observe(f'stage:{stage}', duration)
+        increment('stage_total', stage=stage, status=status)
+        if otel_span is not None:
+            _otel_span.reset(otel_token)
+            otel_span.set_attribute("status", status)
+            otel_span.end()
+        if TRACE_LOG:
+            print(json.dumps({
+                "request_id": request_id,
+                "stage": stage,
+                "duration_ms": round(duration * 1000, 2),
+                "status": status,
+                **attributes
+            }))
+
+
+def counter_value(name: str, **labels) -> float:
+    """Current value of a counter, summed over any labels not given"""
+    wanted = set(labels.items())
+    with _lock:
+        return sum(value for (counter, counter_labels), value in _counters.items()
+                   if counter == name and wanted <= set(counter_labels))
+
+
+def percentiles(name: str) -> Dict[str, float]:
+    with _lock:
+        samples = np.fromiter(_histograms.get(name, ()), dtype=np.float64)
+    if samples.size == 0:
+        return {}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def _escape_label_value(value) -> str:
+    """Backslash, double quote and newline must be escaped in exposition label values"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join([f'{key}="{_escape_label_value(value)}"' for key, value in labels]) + '}'
+
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    with _lock:
+        histogram_names = list(_histograms.keys())
+        totals = {name: list(value) for name, value in _histogram_totals.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+
+    lines.append("# TYPE stage_duration_seconds summary")
+    for name in sorted(histogram_names):
+        metric, _, stage = name.partition(':')
+        label = f'stage="{_escape_label_value(stage)}"' if metric == 'stage' else f'name="{_escape_label_value(name)}"'
+        for quantile, value in percentiles(name).items():
+            lines.append(f'stage_duration_seconds{{{label},quantile="0.{quantile[1:]}"}} {value:.6f}')
+        count, total = totals.get(name, (0, 0.0))
+        lines.append(f'stage_duration_seconds_count{{{label}}} {count}')
+        lines.append(f'stage_duration_seconds_sum{{{label}}} {total:.6f}')
+
+    counter_names = sorted({name for name, _ in counters})
+    for counter in counter_names:
+        lines.append(f"# TYPE {counter} counter")
+        for (name, labels), value in sorted(counters.items()):
+            if name == counter:
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    # Derived hit rate per cache
+    cache_totals = defaultdict(lambda: [0.0, 0.0])
+    for (name, labels), value in counters.items():
+        if name == 'cache_requests_total':
+            labels = dict(labels)
+            cache_totals[labels['cache']][0 if labels['result'] == 'hit' else 1] += value
+    if cache_totals:
+        lines.append("# TYPE cache_hit_ratio gauge")
+        for cache, (hits, misses) in sorted(cache_totals.items()):
+            lines.append(f'cache_hit_ratio{{cache="{cache}"}} {hits / (hits + misses):.4f}')
+
+    gauge_names = sorted({name for name, _ in gauges})
+    for gauge in gauge_names:
+        lines.append(f"# TYPE {gauge} gauge")
+        for (name, labels), value in sorted(gauges.items()):
+            if name == gauge:
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    return "\n".join(lines) + "\n"
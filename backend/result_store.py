@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import numpy as np
+
+import metrics
+from admission import DeadlineExceeded
+
+# "sqlite" (default), "memory" or "none"
+RESULT_STORE_BACKEND = os.environ.get('RESULT_STORE', 'sqlite')
+RESULT_STORE_PATH = os.environ.get('RESULT_STORE_PATH', 'results.sqlite3')
+# Results older than this are purged, 0 keeps them forever
+RESULT_RETENTION_DAYS = float(os.environ.get('RESULT_RETENTION_DAYS', 30))
+# Upper bound on stored results, least recently used ones go first, 0 for no limit
+RESULT_MAX_ROWS = int(os.environ.get('RESULT_MAX_ROWS', 100000))
+# Retention is enforced every this many writes
+PURGE_EVERY = 200
+
+SCORE_SCALE = 65535
+
+
+def result_key(data, idempotency_key=None):
+    """
+    Key a pipeline request by a hash of everything that changes the result.
+    An Idempotency-Key header is combined with that hash, so reusing a key with
+    a different body never returns another request's result.
+    """
+    digest = hashlib.sha256()
+    for part in (data.get('image', ''), data.get('category', ''), data.get('mode', '')):
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    if idempotency_key:
+        return f"idem:{idempotency_key}:{digest.hexdigest()}"
+    return f"hash:{digest.hexdigest()}"
+
+
+def encode_scores(all_scores):
+    """
+    Pack a {category: score} dict into (categories, bytes): scores in [0, 1]
+    become little-endian uint16 fixed point, 2 bytes per category
+    """
+    categories = tuple(all_scores.keys())
+    values = np.fromiter(all_scores.values(), dtype=np.float64, count=len(categories))
+    packed = np.round(np.clip(values, 0.0, 1.0) * SCORE_SCALE).astype('<u2')
+    return categories, packed.tobytes()
+
+
+def decode_scores(categories, blob):
+    values = (np.frombuffer(blob, dtype='<u2') / SCORE_SCALE).tolist()
+    return {category: round(value, 3) for category, value in zip(categories, values)}
+
+
+def _split_response(response):
+    """Return (response without all_scores, all_scores or None) without mutating the input"""
+    eligibility = response.get('eligibility')
+    if not eligibility or 'all_scores' not in eligibility:
+        return response, None
+    stripped = dict(response)
+    stripped['eligibility'] = {k: v for k, v in eligibility.items() if k != 'all_scores'}
+    return stripped, eligibility['all_scores']
+
+
+def _join_response(response, all_scores):
+    if all_scores is not None:
+        response['eligibility']['all_scores'] = all_scores
+    return response
+
+
+class ResultStore:
+    """Interface for stored /image-capture responses"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def put(self, key, response):
+        raise NotImplementedError
+
+    def purge(self):
+        """Apply the retention policy, return the number of removed results"""
+        return 0
+
+
+class MemoryResultStore(ResultStore):
+    """In-process LRU store, lost on restart and not shared between workers"""
+
+    def __init__(self, max_rows=RESULT_MAX_ROWS, retention_days=RESULT_RETENTION_DAYS):
+        self.max_rows = max_rows
+        self.retention_seconds = retention_days * 86400
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            created_at, response, categories, blob = entry
+            if self.retention_seconds and time.time() - created_at > self.retention_seconds:
+                del self._results[key]
+                return None
+            self._results.move_to_end(key)
+        return _join_response(json.loads(response), decode_scores(categories, blob) if blob else None)
+
+    def put(self, key, response):
+        stripped, all_scores = _split_response(response)
+        categories, blob = encode_scores(all_scores) if all_scores is not None else ((), None)
+        with self._lock:
+            self._results[key] = (time.time(), json.dumps(stripped), categories, blob)
+            self._results.move_to_end(key)
+            while self.max_rows and len(self._results) > self.max_rows:
+                self._results.popitem(last=False)
+
+
+class SQLiteResultStore(ResultStore):
+    """
+    SQLite store in WAL mode, so gunicorn workers on the same host can read
+    while another one writes. Responses are stored as zlib-compressed JSON and
+    the category scores as a uint16 blob against a shared category list.
+    """
+
+    def __init__(self, path=RESULT_STORE_PATH, max_rows=RESULT_MAX_ROWS, retention_days=RESULT_RETENTION_DAYS):
+        self.path = path
+        self.max_rows = max_rows
+        self.retention_seconds = retention_days * 86400
+        self._local = threading.local()
+        self._category_sets = {}
+        self._writes = 0
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS category_sets (
+                id INTEGER PRIMARY KEY,
+                categories TEXT UNIQUE NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                response BLOB NOT NULL,
+                category_set INTEGER,
+                scores BLOB
+            );
+            CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at);
+            CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access);
+        """)
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _category_set_id(self, conn, categories):
+        encoded = json.dumps(categories)
+        set_id = self._category_sets.get(encoded)
+        if set_id is None:
+            conn.execute("INSERT OR IGNORE INTO category_sets (categories) VALUES (?)", (encoded,))
+            set_id = conn.execute("SELECT id FROM category_sets WHERE categories = ?", (encoded,)).fetchone()[0]
+            self._category_sets[encoded] = set_id
+        return set_id
+
+    def _categories(self, conn, set_id):
+        for encoded, known_id in self._category_sets.items():
+            if known_id == set_id:
+                return json.loads(encoded)
+        encoded = conn.execute("SELECT categories FROM category_sets WHERE id = ?", (set_id,)).fetchone()[0]
+        self._category_sets[encoded] = set_id
+        return json.loads(encoded)
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT created_at, response, category_set, scores FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        created_at, response, set_id, blob = row
+        now = time.time()
+        if self.retention_seconds and now - created_at > self.retention_seconds:
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+
+        all_scores = decode_scores(self._categories(conn, set_id), blob) if blob is not None else None
+        return _join_response(json.loads(zlib.decompress(response)), all_scores)
+
+    def put(self, key, response):
+        stripped, all_scores = _split_response(response)
+        conn = self._connection()
+        set_id, blob = None, None
+        if all_scores is not None:
+            categories, blob = encode_scores(all_scores)
+            set_id = self._category_set_id(conn, list(categories))
+
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO results (key, created_at, last_access, response, category_set, scores) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, now, now, zlib.compress(json.dumps(stripped).encode()), set_id, blob)
+        )
+
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge()
+
+    def purge(self):
+        conn = self._connection()
+        removed = 0
+        if self.retention_seconds:
+            removed += conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.retention_seconds,)).rowcount
+        if self.max_rows:
+            removed += conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,)
+            ).rowcount
+        return removed
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one: the first caller runs
+    the function, the others wait for and share its result (or exception).
+    Works within one process; across workers the result store catches repeats.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def run(self, key, fn, deadline=None):
+        """
+        Return (result, shared) where shared is True for callers that waited on another one.
+        A waiting caller gives up with DeadlineExceeded once its own deadline
+        (time.monotonic() value) passes, the leader's call keeps running.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not call['done'].wait(timeout):
+                metrics.increment('shed_total', stage='single_flight', reason='deadline')
+                raise DeadlineExceeded('single_flight')
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+
+        try:
+            call['result'] = fn()
+            return call['result'], False
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+def create_result_store(backend=RESULT_STORE_BACKEND):
+    if backend == 'sqlite':
+        return SQLiteResultStore()
+    if backend == 'memory':
+        return MemoryResultStore()
+    if backend in ('none', ''):
+        return None
+    raise ValueError(f"Unknown RESULT_STORE backend '{backend}', expected sqlite, memory or none")
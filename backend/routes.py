@@ -1,31 +1,277 @@
 from flask import Flask
 from flask_cors import CORS
-from flask import request, jsonify
+from flask import request, jsonify, g, Response
 import base64
 import io
 from PIL import Image
 import requests
 from LLM.text_extraction import extract_resume_text_with_groq_for_ml, clean_for_ml_model
-from Model.predicted import check_eligibility
-from LLM.Feedback import generate_resume_feedback_with_groq, generate_detailed_resume_analysis_with_groq
-import numpy as np  
+from Model.predicted import check_eligibility, MODEL_STATE
+from Model.similarity import index_resumes, match_text, similar_resumes, SEARCH_MODES
+from LLM.Feedback import generate_resume_feedback_with_groq, generate_detailed_resume_analysis_with_groq, generate_combined_resume_feedback_with_groq
+import os
+import time
+import threading
+import uuid
+import metrics
+from metrics import trace_stage
+from json_provider import NumpyJSONProvider
+from result_store import create_result_store, result_key, SingleFlight
+from admission import LIMITERS, Overloaded, DeadlineExceeded, request_deadline, admit_llm
+
+# "combined" asks the LLM for feedback and detailed analysis in one JSON completion,
+# "two_call" keeps the original two round trips. Can be overridden per request with "mode".
+FEEDBACK_MODE = os.environ.get('FEEDBACK_MODE', 'two_call')
 
 app = Flask(__name__)
+app.json = NumpyJSONProvider(app)
 CORS(app)
 
-def convert_numpy_types(obj):
-    if isinstance(obj, dict):
-        return {k: convert_numpy_types(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_numpy_types(v) for v in obj]
-    elif isinstance(obj, (np.integer, np.int32, np.int64)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float32, np.float64)):
-        return float(obj)
-    elif isinstance(obj, np.bool_):
-        return bool(obj)
+# Shared with serve.py: shutting_down is set when a worker receives SIGTERM so
+# /readyz fails while in-flight requests drain
+SERVING_STATE = {'shutting_down': False, 'in_flight': 0}
+_in_flight_lock = threading.Lock()
+UNTRACKED_ENDPOINTS = ('metrics_endpoint', 'liveness', 'readiness')
+
+# Upper bound on "top_k" for /match-job and /similar-resumes
+MAX_TOP_K = int(os.environ.get('MAX_TOP_K', 100))
+
+# Finished /image-capture responses, keyed by Idempotency-Key or content hash (see result_store.py)
+result_store = create_result_store()
+single_flight = SingleFlight()
+
+@app.before_request
+def start_request_trace():
+    g.request_id = metrics.new_request_id(request.headers.get('X-Request-ID'))
+    g.request_started_at = time.perf_counter()
+    g.tracked = request.endpoint not in UNTRACKED_ENDPOINTS
+    if g.tracked:
+        with _in_flight_lock:
+            SERVING_STATE['in_flight'] += 1
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        g.request_span = metrics.start_request_span(f'{request.method} {route}', route=route)
+
+@app.after_request
+def finish_request_trace(response):
+    if g.tracked:
+        # The route pattern, not the raw path, so unknown URLs can not create new series
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe(f'stage:request {route}', time.perf_counter() - g.request_started_at)
+        metrics.increment('http_requests_total', path=route, status=response.status_code)
+        g.status_code = response.status_code
+    response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.teardown_request
+def release_in_flight(exc=None):
+    if g.get('tracked'):
+        with _in_flight_lock:
+            SERVING_STATE['in_flight'] -= 1
+        metrics.end_request_span(g.get('request_span'), g.get('status_code'))
+
+@app.route('/healthz', methods=['GET'])
+def liveness():
+    return jsonify({'status': 'alive', 'pid': os.getpid()}), 200
+
+@app.route('/readyz', methods=['GET'])
+def readiness():
+    ready = MODEL_STATE['warm'] and not SERVING_STATE['shutting_down']
+    return jsonify({
+        'ready': ready,
+        'model': MODEL_STATE,
+        'shutting_down': SERVING_STATE['shutting_down'],
+        'in_flight': SERVING_STATE['in_flight'],
+        'pid': os.getpid()
+    }), 200 if ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def record_llm_stats(mode, llm_stats):
+    """Calls, tokens and LLM time of one request per feedback mode, so /metrics can compare the modes"""
+    metrics.increment('llm_requests_total', mode=mode)
+    metrics.increment('llm_calls_total', llm_stats.get('calls', 0), mode=mode)
+    for kind in ('prompt', 'completion'):
+        metrics.increment('llm_tokens_total', llm_stats.get(f'{kind}_tokens', 0), mode=mode, kind=kind)
+    if 'failed_combined_call' in llm_stats:
+        metrics.increment('llm_fallback_total', mode=mode)
+    metrics.observe(f'stage:llm_call:{mode}', llm_stats.get('latency_ms', 0) / 1000)
+
+def generate_feedback(eligibility_result, text, category, combined, deadline=None):
+    """
+    Run the LLM feedback stage(s). Returns (feedback_result, detailed_analysis_result, error),
+    raises DeadlineExceeded when the Groq calls run out of time.
+    """
+    if combined:
+        print("Combined feedback and detailed analysis in process")
+        with trace_stage("combined_feedback"):
+            combined_result = generate_combined_resume_feedback_with_groq(
+                eligibility_result,
+                text,
+                category,
+                deadline
+            )
+        
+        if not combined_result['success']:
+            return None, None, combined_result['error']
+        
+        print(f"LLM stats ({combined_result['mode']}): {combined_result['llm_stats']}")
+        # Counted under the requested mode, a fallback to two calls is part of its cost
+        record_llm_stats('combined', combined_result['llm_stats'])
+        return combined_result['feedback'], combined_result['detailed_analysis'], None
+    
+    print("Feedback in process")
+    with trace_stage("feedback"):
+        feedback_result = generate_resume_feedback_with_groq(
+            eligibility_result, 
+            text, 
+            category,
+            deadline
+        )
+    
+    if 'error' in feedback_result:
+        return None, None, feedback_result['error']
+    
+    print("Generating detailed analysis...")
+    # Generate detailed analysis
+    with trace_stage("detailed_analysis"):
+        detailed_analysis_result = generate_detailed_resume_analysis_with_groq(
+            eligibility_result,  # This is already converted
+            text,
+            category,
+            deadline
+        )
+    print("Detailed analysis completed")
+    
+    if not detailed_analysis_result['success']:
+        return None, None, detailed_analysis_result['error']
+    
+    print(f"LLM stats (two_call): feedback={feedback_result.get('llm_stats')}, detailed={detailed_analysis_result.get('llm_stats')}")
+    record_llm_stats('two_call', {
+        key: feedback_result.get('llm_stats', {}).get(key, 0) + detailed_analysis_result.get('llm_stats', {}).get(key, 0)
+        for key in ('calls', 'latency_ms', 'prompt_tokens', 'completion_tokens')
+    })
+    return feedback_result, detailed_analysis_result, None
+
+def run_analysis(data, deadline):
+    """
+    Run OCR, eligibility and feedback for one request body. Returns (response, status),
+    the response always includes extracted_text.
+    
+    Each stage waits for a slot in its limiter (see admission.py). OCR and the model
+    raise Overloaded / DeadlineExceeded, the LLM stage is skipped instead and the
+    response is marked degraded.
+    """
+    base64_image = data.get('image')
+    category = data.get('category')
+    
+    print(f"Received image and category: {category}")
+    
+    print("Text extraction started")
+    with LIMITERS['ocr'].slot(deadline), trace_stage("text_extraction"):
+        result = extract_resume_text_with_groq_for_ml(base64_image, deadline)
+    print("Text extraction completed")
+    
+    
+    if not result['success']:
+        return {
+            'success': False,
+            'error': result['error']
+        }, 400
+        
+    print("Now checking the eligibility")
+    text = result['ml_ready_text']
+    print(text)
+    with trace_stage("clean_for_ml_model"):
+        clean_text = clean_for_ml_model(text)
+    
+    print(clean_text)
+    
+    with LIMITERS['model'].slot(deadline), trace_stage("check_eligibility"):
+        eligibility_result = check_eligibility(clean_text, category, return_embedding=True)
+    resume_vector = eligibility_result.pop('embedding', None)
+    print(eligibility_result)
+    
+    if 'error' in eligibility_result:
+        return {
+            'success': False,
+            'error': eligibility_result['error']
+        }, 400
+    
+    # Keep the resume vector (from the same forward pass) for /match-job and /similar-resumes,
+    # never fail the analysis over it
+    # Generated here, the client-supplied X-Request-ID may repeat or collide
+    resume_id = uuid.uuid4().hex
+    resume_indexed = False
+    try:
+        with trace_stage("index_resume"):
+            resume_indexed = index_resumes([resume_id], [clean_text], [{
+                'predicted_category': eligibility_result['predicted_category'],
+                'target_category': category,
+                'eligible': eligibility_result['eligible'],
+                'confidence_for_target': eligibility_result['confidence_for_target']
+            }], vectors=[resume_vector])
+    except Exception as e:
+        print(f"Could not index resume {resume_id} [{g.request_id}]: {str(e)}")
+    
+    combined = data.get('mode', FEEDBACK_MODE) == 'combined'
+    feedback_result, detailed_analysis_result = None, None
+    degraded_reason = admit_llm(deadline, combined)
+    if degraded_reason is None:
+        error = None
+        try:
+            feedback_result, detailed_analysis_result, error = generate_feedback(eligibility_result, text, category, combined, deadline)
+        except DeadlineExceeded:
+            # The eligibility result is still worth returning
+            degraded_reason = 'llm_timeout'
+            metrics.increment('degraded_total', reason=degraded_reason)
+        finally:
+            LIMITERS['llm'].release()
+        
+        if error is not None:
+            return {
+                'success': False,
+                'error': error
+            }, 400
+    
+    if degraded_reason is not None:
+        print(f"Skipping LLM feedback [{g.request_id}]: {degraded_reason}")
+    
+    # check_eligibility already returns native Python types
+    response_data = {
+        'success': True,
+        'eligibility': {
+            'eligible': eligibility_result['eligible'],
+            'confidence': eligibility_result['confidence_for_target'],
+            'predicted_category': eligibility_result['predicted_category'],
+            'target_category': eligibility_result['target_category'],
+            'score': eligibility_result['eligibility_score'],
+            'all_scores': eligibility_result['all_category_scores']
+        },
+        'recommendation': eligibility_result.get('recommendation', '')
+    }
+    
+    if degraded_reason is None:
+        response_data['feedback'] = {
+            'message': feedback_result['feedback'],
+            'status': feedback_result['eligibility_status'],
+            'confidence_display': feedback_result['confidence_score'],
+            'rating': feedback_result['rating']
+        }
+        response_data['detailed_analysis'] = detailed_analysis_result['detailed_analysis']
     else:
-        return obj
+        # Overloaded or out of time: eligibility only, the client can retry later for the feedback
+        response_data['degraded'] = True
+        response_data['degraded_reason'] = degraded_reason
+    
+    if resume_indexed:
+        response_data['resume_id'] = resume_id
+    
+    response_data['extracted_text'] = text
+    
+    return response_data, 200
+
 
 @app.route('/image-capture', methods=['POST'])
 def main_pipeline():
@@ -35,108 +281,135 @@ def main_pipeline():
         if not data or 'image' not in data or 'category' not in data:
             return jsonify({'error': 'No image data provided, or category data provided'}), 400
         
-        base64_image = data.get('image')
-        category = data.get('category')
-        
-        print(f"Received image and category: {category}")
+        # Time budget for the whole pipeline, X-Request-Deadline-Ms or "deadline_ms" can only shorten it
+        deadline = request_deadline(request.headers.get('X-Request-Deadline-Ms'), data.get('deadline_ms'))
+        key = result_key(data, request.headers.get('Idempotency-Key'))
+        cached = False
         
-        print("Text extraction started")
-        result = extract_resume_text_with_groq_for_ml(base64_image)
-        print("Text extraction completed")
+        stored = result_store.get(key) if result_store is not None else None
+        if result_store is not None:
+            metrics.record_cache('result_store', stored is not None)
         
-        
-        if not result['success']:
-            return jsonify({
-                'success': False,
-                'error': result['error']
-            }), 400
+        if stored is not None:
+            print(f"Serving stored result for {key[:20]}")
+            response_data, status, cached = stored, 200, True
+        else:
+            def compute():
+                response, status = run_analysis(data, deadline)
+                # Degraded results are not stored so a later request gets the full analysis
+                if status == 200 and not response.get('degraded') and result_store is not None:
+                    result_store.put(key, response)
+                return response, status
             
-        print("Now checking the eligibility")
-        text = result['ml_ready_text']
-        print(text)
-        clean_text = clean_for_ml_model(text)
+            # Identical requests arriving while this one runs wait for its result
+            (response_data, status), shared = single_flight.run(key, compute, deadline)
+            metrics.increment('single_flight_total', role='follower' if shared else 'leader')
+            cached = shared
         
-        print(clean_text)
+        response_data = dict(response_data)
+        if status == 200:
+            response_data['cached'] = cached
         
-        eligibility_result = check_eligibility(clean_text, category)
-        print(eligibility_result)
+        # "compact": true leaves out the extracted resume text, which is most of the payload
+        if data.get('compact', False):
+            response_data.pop('extracted_text', None)
         
-        if 'error' in eligibility_result:
-            return jsonify({
-                'success': False,
-                'error': eligibility_result['error']
-            }), 400
+        return jsonify(response_data), status
         
+    except Overloaded as e:
+        print(f"Shedding request [{g.request_id}]: {str(e)}")
+        response = jsonify({'success': False, 'error': str(e), 'stage': e.stage})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    except DeadlineExceeded as e:
+        print(f"Dropping request [{g.request_id}]: {str(e)}")
+        return jsonify({'success': False, 'error': str(e), 'stage': e.stage}), 504
         
-        print("Converting numpy types in eligibility result...")
-        eligibility_result = convert_numpy_types(eligibility_result)
-        print("Numpy conversion completed")
+    except Exception as e:
+        print(f"Error in main_pipeline [{g.request_id}]: {str(e)}")
+        print(f"Error type: {type(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': f'Server error: {str(e)}'
+        }), 500
+
+
+def parse_top_k(data):
+    """The request's top_k (default 10), or None when it is not an integer between 1 and MAX_TOP_K"""
+    try:
+        top_k = int(data.get('top_k', 10))
+    except (TypeError, ValueError):
+        return None
+    return top_k if 1 <= top_k <= MAX_TOP_K else None
+
+@app.route('/match-job', methods=['POST'])
+def match_job():
+    try:
+        data = request.get_json()
         
-        print("Feedback in process")
-        feedback_result = generate_resume_feedback_with_groq(
-            eligibility_result, 
-            text, 
-            category
-        )
+        if not data or not data.get('job_description'):
+            return jsonify({'success': False, 'error': 'No job_description provided'}), 400
         
-        if 'error' in feedback_result:
-            return jsonify({
-                'success': False,
-                'error': feedback_result['error']
-            }), 400
+        top_k = parse_top_k(data)
+        if top_k is None:
+            return jsonify({'success': False, 'error': f'top_k must be an integer between 1 and {MAX_TOP_K}'}), 400
         
-        print("Generating detailed analysis...")
-        # Generate detailed analysis
-        detailed_analysis_result = generate_detailed_resume_analysis_with_groq(
-            eligibility_result,  # This is already converted
-            text,
-            category
-        )
-        print("Detailed analysis completed")
+        search_mode = data.get('search_mode', 'auto')
+        if search_mode not in SEARCH_MODES:
+            return jsonify({'success': False, 'error': f"search_mode must be one of {', '.join(SEARCH_MODES)}"}), 400
         
-        if not detailed_analysis_result['success']:
-            return jsonify({
-                'success': False,
-                'error': detailed_analysis_result['error']
-            }), 400
+        started_at = time.perf_counter()
+        with trace_stage("match_job"):
+            matches = match_text(
+                clean_for_ml_model(data['job_description']),
+                top_k=top_k,
+                mode=search_mode
+            )
         
-        # Build response with already converted data
-        response_data = {
+        return jsonify({
             'success': True,
-            'extracted_text': text,
-            'eligibility': {
-                'eligible': eligibility_result['eligible'],
-                'confidence': eligibility_result['confidence_for_target'],
-                'predicted_category': eligibility_result['predicted_category'],
-                'target_category': eligibility_result['target_category'],
-                'score': eligibility_result['eligibility_score'],
-                'all_scores': eligibility_result['all_category_scores']
-            },
-            'feedback': {
-                'message': feedback_result['feedback'],
-                'status': feedback_result['eligibility_status'],
-                'confidence_display': feedback_result['confidence_score'],
-                'rating': feedback_result['rating']
-            },
-            'detailed_analysis': detailed_analysis_result['detailed_analysis'],
-            'recommendation': eligibility_result.get('recommendation', '')
-        }
+            'matches': matches,
+            'query_ms': round((time.perf_counter() - started_at) * 1000, 2)
+        }), 200
+        
+    except Exception as e:
+        print(f"Error in match_job [{g.request_id}]: {str(e)}")
+        return jsonify({'success': False, 'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/similar-resumes', methods=['POST'])
+def find_similar_resumes():
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('resume_id'):
+            return jsonify({'success': False, 'error': 'No resume_id provided'}), 400
+        
+        top_k = parse_top_k(data)
+        if top_k is None:
+            return jsonify({'success': False, 'error': f'top_k must be an integer between 1 and {MAX_TOP_K}'}), 400
         
-        # Final safety conversion
-        final_response = convert_numpy_types(response_data)
+        search_mode = data.get('search_mode', 'auto')
+        if search_mode not in SEARCH_MODES:
+            return jsonify({'success': False, 'error': f"search_mode must be one of {', '.join(SEARCH_MODES)}"}), 400
         
-        return jsonify(final_response), 200
+        with trace_stage("similar_resumes"):
+            matches = similar_resumes(
+                data['resume_id'],
+                top_k=top_k,
+                mode=search_mode
+            )
+        
+        if matches is None:
+            return jsonify({'success': False, 'error': f"Unknown resume_id '{data['resume_id']}'"}), 404
+        
+        return jsonify({'success': True, 'matches': matches}), 200
         
     except Exception as e:
-        print(f"Error in main_pipeline: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            'success': False,
-            'error': f'Server error: {str(e)}'
-        }), 500
-
+        print(f"Error in find_similar_resumes [{g.request_id}]: {str(e)}")
+        return jsonify({'success': False, 'error': f'Server error: {str(e)}'}), 500
 
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+"""
+Production entry point for the Flask API.
+
+routes.py's app.run(debug=True) is the single-process development server. This
+runs the same app under gunicorn with preforked gthread workers. The app, the
+TensorFlow/Keras modules and the tokenizer/label encoder/config are loaded once
+in the master before forking, so workers share those pages copy-on-write.
+
+The Keras model itself is loaded and warmed up in each worker right after the
+fork: TensorFlow is not fork-safe, and a model that has run in the master hangs
+on its first prediction in the child. /readyz stays 503 until the worker's
+model is warm.
+
+    python serve.py --workers 4 --threads 4 --bind 0.0.0.0:5000
+
+On SIGTERM each worker stops accepting connections, reports not-ready on
+/readyz and finishes its in-flight requests for up to --graceful-timeout
+seconds. /healthz is the liveness probe.
+"""
+import argparse
+import gc
+import os
+import signal
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+
+class ResumeDetectorApplication(BaseApplication):
+
+    def __init__(self, app, options):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def post_worker_init(worker):
+    """
+    Load and warm up this worker's model, and flip readiness off as soon as the
+    worker is asked to stop so load balancers drain it while gunicorn finishes
+    in-flight requests
+    """
+    from routes import SERVING_STATE
+    from Model.predicted import warmup_model, MODEL_PATH
+
+    state = warmup_model(MODEL_PATH)
+    worker.log.info("Worker %s model ready (load %ss, warmup %ss)", worker.pid, state['load_seconds'], state['warmup_seconds'])
+
+    gunicorn_handle_exit = worker.handle_exit
+
+    def handle_exit(sig, frame):
+        SERVING_STATE['shutting_down'] = True
+        worker.log.info("Worker %s draining %s in-flight request(s)", worker.pid, SERVING_STATE['in_flight'])
+        gunicorn_handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_exit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the resume detector API with gunicorn")
+    parser.add_argument('--bind', default=os.environ.get('BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', 2)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('THREADS', 4)))
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('WORKER_TIMEOUT', 120)),
+                        help="Seconds a request may run before the worker is restarted")
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.environ.get('GRACEFUL_TIMEOUT', 60)),
+                        help="Seconds to drain in-flight requests on shutdown")
+    parser.add_argument('--model-path', default=os.environ.get('MODEL_PATH', 'final_resume_model.h5'))
+    parser.add_argument('--artifacts-dir', default=os.environ.get('ARTIFACTS_DIR', '.'),
+                        help="Directory holding the model and tokenizer.pkl, label_encoder.pkl, model_config.pkl")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(args.artifacts_dir)
+    os.environ['MODEL_PATH'] = args.model_path
+
+    from routes import app
+    from Model.predicted import load_preprocessing_artifacts
+
+    print(f"Preloading app and preprocessing artifacts in master process {os.getpid()}")
+    load_preprocessing_artifacts()
+    # Move everything allocated so far out of the tracked generations so the
+    # workers' garbage collector does not touch (and copy) the shared pages
+    gc.freeze()
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'preload_app': True,
+        'post_worker_init': post_worker_init,
+    }
+    ResumeDetectorApplication(app, options).run()
+
+
+if __name__ == '__main__':
+    main()
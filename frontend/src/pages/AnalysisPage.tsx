@@ -406,34 +406,57 @@ const AnalysisPage: React.FC = () => {
             </div>
 
             {/* Feedback */}
-            <div className="bg-white/80 backdrop-blur-sm rounded-2xl border border-gray-300/60 p-6">
-              <h3 className="text-lg font-semibold text-gray-900 mb-4 flex items-center">
-                <MessageSquare className="w-5 h-5 mr-2" />
-                AI Feedback
-              </h3>
-              
-              <div className="space-y-4">
-                <div className="flex items-center justify-between">
-                  <StarRating rating={result.feedback?.rating || 0} />
-                  <span className="text-sm text-gray-600">
-                    Status: {result.feedback?.status}
-                  </span>
-                </div>
-                
-                <p className="text-gray-700 leading-relaxed">
-                  {result.feedback?.message}
+            {result.degraded ? (
+              // The server was busy or out of time, only the eligibility result came back
+              <div className="bg-amber-50 rounded-2xl border-2 border-amber-200 p-6">
+                <h3 className="text-lg font-semibold text-gray-900 mb-2 flex items-center">
+                  <AlertCircle className="w-5 h-5 mr-2 text-amber-600" />
+                  AI Feedback Unavailable
+                </h3>
+                <p className="text-gray-700 mb-4">
+                  The feedback service is busy right now, so only your eligibility result is shown.
+                  Please retry in a little while to get the AI feedback and detailed analysis.
                 </p>
+                <button
+                  onClick={analyzeResume}
+                  className="flex items-center px-4 py-2 bg-amber-600 text-white rounded-lg hover:bg-amber-700 transition-colors"
+                >
+                  <RefreshCw className="w-4 h-4 mr-2" />
+                  Retry
+                </button>
               </div>
-            </div>
+            ) : (
+              <div className="bg-white/80 backdrop-blur-sm rounded-2xl border border-gray-300/60 p-6">
+                <h3 className="text-lg font-semibold text-gray-900 mb-4 flex items-center">
+                  <MessageSquare className="w-5 h-5 mr-2" />
+                  AI Feedback
+                </h3>
+                
+                <div className="space-y-4">
+                  <div className="flex items-center justify-between">
+                    <StarRating rating={result.feedback?.rating || 0} />
+                    <span className="text-sm text-gray-600">
+                      Status: {result.feedback?.status}
+                    </span>
+                  </div>
+                  
+                  <p className="text-gray-700 leading-relaxed">
+                    {result.feedback?.message}
+                  </p>
+                </div>
+              </div>
+            )}
 
             {/* Detailed Analysis & Recommendations */}
             <div className="grid grid-cols-1 lg:grid-cols-2 gap-8">
-              <div className="bg-white/80 backdrop-blur-sm rounded-2xl border border-gray-300/60 p-6">
-                <h3 className="text-lg font-semibold text-gray-900 mb-4">Detailed Analysis</h3>
-                <p className="text-gray-700 leading-relaxed">
-                  {result.detailed_analysis}
-                </p>
-              </div>
+              {!result.degraded && (
+                <div className="bg-white/80 backdrop-blur-sm rounded-2xl border border-gray-300/60 p-6">
+                  <h3 className="text-lg font-semibold text-gray-900 mb-4">Detailed Analysis</h3>
+                  <p className="text-gray-700 leading-relaxed">
+                    {result.detailed_analysis}
+                  </p>
+                </div>
+              )}
               
               <div className="bg-white/80 backdrop-blur-sm rounded-2xl border border-gray-300/60 p-6">
                 <h3 className="text-lg font-semibold text-gray-900 mb-4 flex items-center">
@@ -1,6 +1,7 @@
 export interface AnalysisRequest {
   image: string;
   category: string;
+  compact?: boolean;
 }
 
 export interface CategoryScores {
@@ -30,6 +31,8 @@ export interface AnalysisResponse {
   feedback?: FeedbackData;
   detailed_analysis?: string;
   recommendation?: string;
+  degraded?: boolean;
+  degraded_reason?: string;
   error?: string;
 }
 